@@ -20,8 +20,10 @@ Moving any of these folders or files will prevent the game from working properly
 Author: Walker M. White (wmw2)
 Date:   November 1, 2017 (Python 3 Version)
 """
+import startup   # First, so that startup is timed from here
 from consts import *
 from app import *
+startup.mark('imports')
 
 # Application code
 if __name__ == '__main__':
@@ -12,6 +12,16 @@ you are ensure about where a new class should go, post a question on Ed Discussi
 from consts import *
 from game2d import *
 from wave import *
+from profiler import Profiler
+from replay import Recorder, ReplayInput
+from sounds import SoundBank
+from rewind import Rewind
+from campaign import Campaign
+import hud
+import physics
+import startup
+import wavefile
+import threading
 import json
 
 # PRIMARY RULE: Planetoids can only access attributes in wave.py via getters/setters
@@ -60,7 +70,7 @@ class Planetoids(GameApp):
     # THE ATTRIBUTES LISTED ARE SUGGESTIONS ONLY AND CAN BE CHANGED AS YOU SEE FIT
     # Attribute _state: the current state of the game as a value from consts.py
     # Invariant: _state is one of STATE_INACTIVE, STATE_LOADING, STATE_PAUSED, 
-    #            STATE_ACTIVE, STATE_CONTINUE
+    #            STATE_ACTIVE, STATE_CONTINUE, STATE_COMPLETE, STATE_NEXT
     #
     # Attribute _wave: the subcontroller for a single wave, which manages the game
     # Invariant: _wave is a Wave object, or None if there is no wave currently active.
@@ -73,10 +83,50 @@ class Planetoids(GameApp):
     # Attribute _message: the currently active message
     # Invariant: _message is a GLabel, or None if there is no message to display. It is 
     #            only None if _state is STATE_ACTIVE.
+    #
+    # Titles and messages come from hud.title and hud.message, which make each one
+    # once. Never make a GLabel in a method called every frame.
+    #
+    # Attribute _sounds: the sounds of the wave events
+    # Invariant: _sounds is a SoundBank, or None until the assets are loaded
+    #
+    # Attribute _assets: the steps of loading the assets still to do
+    # Invariant: _assets is a list of methods with no arguments, run in order
+    #
+    # Attribute _campaign: the waves to play, in order
+    # Invariant: _campaign is a Campaign of CAMPAIGN
+    #
+    # Attribute _rewind: the history of the wave, to step it back with REWIND_KEY
+    # Invariant: _rewind is a Rewind of _wave, or None if there is no wave
+    #
+    # Attribute _hud: the lives and score
+    # Invariant: _hud is a hud.Hud, only drawn when there is a wave
     # START REMOVE
     # Attribute _sdown: Whether the 'S' was help down last frame
     # Invariant: _sdown is a boolean
     # END REMOVE
+    #
+    # Attribute _profiler: the frame profiler
+    # Invariant: _profiler is a Profiler, or None if profiling is off
+    #
+    # Attribute _overlay: the profiler statistics shown on screen
+    # Invariant: _overlay is a GLabel, or None if profiling is off
+    #
+    # Attribute _pdown: whether PROFILE_KEY was held down last frame
+    # Invariant: _pdown is a bool
+    #
+    # Attribute _lag: the time the wave is behind the clock, in seconds
+    # Invariant: _lag is a float >= 0. It is less than TICK_TIME after each frame
+    #            in STATE_ACTIVE.
+    #
+    # Attribute _ticks: the number of wave ticks run this frame
+    # Invariant: _ticks is an int >= 0 and <= MAX_TICKS
+    #
+    # Attribute _recorder: the recording of the current wave
+    # Invariant: _recorder is a Recorder, or None if replaying or there is no wave
+    #
+    # Attribute _replay: the recording being replayed
+    # Invariant: _replay is a ReplayInput, or None if the player is playing
 
     # DO NOT MAKE A NEW INITIALIZER!
 
@@ -97,14 +147,30 @@ class Planetoids(GameApp):
         
         self._state = STATE_INACTIVE
         self._wave = None
-        self._title = GLabel(text="Planetoids", font_name = TITLE_FONT, font_size= TITLE_SIZE,
-        x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + TITLE_OFFSET)
-        self._message = GLabel(text="Press 's' to Start", font_name = MESSAGE_FONT,
-        font_size= MESSAGE_SIZE, x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + MESSAGE_OFFSET)
+        self._title = hud.title("Planetoids")
+        self._message = hud.message("Press 's' to Start")
+        self._hud = hud.Hud()
         self._sdown = False
+        self._lag = 0.0
+        self._ticks = 0
+        self._recorder = None
+        self._replay = None
+        self._rewind = None
+        self._campaign = Campaign(CAMPAIGN, self._load_wave)
+        if REPLAY_FILE is not None:
+            self._replay = ReplayInput(REPLAY_FILE)
+            self._state = STATE_LOADING
+            self._title = None
+            self._message = None
+        self._profiler = None
+        self._overlay = None
+        self._pdown = False
         self._background = GRectangle(left = 0, bottom = 0, height = GAME_HEIGHT,
         width = GAME_WIDTH, fillcolor = 'pink')
-        self._pewSound = Sound('pew2.wav')        
+        self._sounds = None
+        self._assets = [self._load_sounds, self._load_textures, self._load_labels]
+        threading.Thread(target=self._prefetch, daemon=True).start()
+        startup.mark('start')
         
         # IMPLEMENT ME
     
@@ -137,7 +203,9 @@ class Planetoids(GameApp):
         STATE_ACTIVE: This is a session of normal gameplay. The player can move the
         ship and fire bullets. All of this should be handled inside of class Wave
         (NOT in this class). Hence the Wave class should have an update() method, just
-        like the subcontroller example in lecture.
+        like the subcontroller example in lecture. The wave is updated at a fixed
+        TICK_RATE, so a frame may run no ticks or several (at most MAX_TICKS) to keep
+        up with the clock.
         
         STATE_PAUSED: Like STATE_INACTIVE, this is a paused state. However, the game is
         still visible on the screen.
@@ -147,12 +215,30 @@ class Planetoids(GameApp):
         previous frame, and the player pressed a key. This state only lasts one animation
         frame before switching to STATE_ACTIVE.
         
+        STATE_COMPLETE: This state shows whether the game was won or lost, and waits
+        for the player to press a key to play again (going back to STATE_LOADING).
+
+        STATE_NEXT: This state switches to the next wave of the campaign when the
+        current one is cleared (see campaign.py), keeping the lives and the score. The
+        next wave was made on a background thread, so this state only lasts one
+        animation frame, which already shows the next wave, before switching to
+        STATE_ACTIVE.
+
         You are allowed to add more states if you wish. Should you do so, you should
         describe them here.
         
+        If the game is replaying a recording (see replay.py), the keys come from the
+        recording instead of the player, and STATE_ACTIVE runs the recorded ticks
+        instead of those the clock is owed. Otherwise each wave is recorded, and saved
+        to RECORD_FILE whenever the ship is destroyed or the wave is complete.
+
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        self._update_profiler()
+        self._update_assets()
+        self._ticks = 0
+
         if self._state == STATE_INACTIVE:
             self._update_inactive()
 
@@ -161,20 +247,22 @@ class Planetoids(GameApp):
 
         if self._state == STATE_ACTIVE:
             self._update_active(dt)
-            if self.input.is_key_down('spacebar'):
-                self._pewSound.play()
+
+        if self._state == STATE_NEXT:
+            self._update_next()
             
         if self._state == STATE_PAUSED:
             self._update_paused()
 
         if self._state == STATE_CONTINUE:
             self._update_continue()
-            if self.input.is_key_down('spacebar'):
-                self._pewSound.play()
 
         if self._state == STATE_COMPLETE:
             self._update_complete()
 
+        self._update_recording()
+        self._update_sounds(dt)
+
     def draw(self):
         """
         Draws the game objects to the view.
@@ -187,66 +275,274 @@ class Planetoids(GameApp):
         attributes or you need to add a draw method to class Wave. We suggest the latter. 
         See the example subcontroller.py from class.
         """
+        if self._profiler is not None:
+            self._profiler.start()
+
         self._background.draw(self.view)
 
         if self._wave is not None:
-            self._wave.draw(self.view)
+            if self._state == STATE_ACTIVE and self._replay is None:
+                self._wave.draw(self.view, self._lag/TICK_TIME)
+            else:
+                self._wave.draw(self.view)
+
+        if self._wave is not None:
+            self._hud.update(self._wave.getlives(), self._wave.getdestroyed())
+            self._hud.draw(self.view)
 
         if self._message is not None:
             self._message.draw(self.view)
 
         if self._title is not None:
             self._title.draw(self.view)
+
+        if self._profiler is not None:
+            self._profiler.lap('draw')
+            self._overlay.draw(self.view)
+        startup.mark('first frame')
         
     
     # HELPER METHODS FOR THE STATES GO HERE
     def _update_inactive(self):
-        if self.input.is_key_down('s') and self._sdown == False:
+        if self._getinput().is_key_down('s') and self._sdown == False:
             self._state = STATE_LOADING
             self._message = None
             self._title = None
             self._sdown = True
 
     def _update_loading(self):
-        self._wave = Wave(self.load_json(DEFAULT_WAVE))
+        while len(self._assets) > 0:
+            self._update_assets()
+        if self._replay is None:
+            self._begin_wave(self._campaign.start())
+        else:
+            wave = Wave(self._load_wave(self._replay.getwave()),
+                        seed=self._replay.getseed())
+            wave.setlives(self._replay.getlives())
+            wave.setdestroyed(self._replay.getdestroyed())
+            self._begin_wave(wave)
+
+    def _update_next(self):
+        # Finish the recording of the cleared wave, as the next one has its own
+        if self._recorder is not None:
+            self._recorder.record(self.input, self._ticks)
+            self._recorder.save(RECORD_FILE)
+        self._ticks = 0
+        wave = self._campaign.advance()
+        wave.setlives(self._wave.getlives())
+        wave.setdestroyed(self._wave.getdestroyed())
+        self._begin_wave(wave)
+
+    def _begin_wave(self, wave):
+        """
+        Makes wave the wave being played, and starts playing it.
+
+        Parameter wave: The wave to play
+        Precondition: wave is a new Wave
+        """
+        self._wave = wave
+        if self._replay is None:
+            self._recorder = Recorder(self._wave.getseed(), self._campaign.getname(),
+                                      self._wave.getlives(), self._wave.getdestroyed())
+        self._wave.setprofiler(self._profiler)
+        self._wave.setevents(True)
+        self._rewind = Rewind(self._wave)
         self._state = STATE_ACTIVE
         self._sdown = False
+        self._lag = 0.0
 
     def _update_active(self, dt):
-        self._wave.update(self.input, dt)
+        if self._replay is not None:
+            # Run the recorded ticks, whatever the clock says (with no lag, the wave is
+            # drawn at the last tick, not between the last two)
+            self._lag = 0.0
+            for tick in range(self._replay.getticks()):
+                if self._state == STATE_ACTIVE:
+                    self._update_tick()
+        else:
+            # Run the ticks the clock is owed, but give up on catching up after MAX_TICKS
+            self._lag += dt
+            while self._state == STATE_ACTIVE and self._lag >= TICK_TIME:
+                if self._ticks == MAX_TICKS:
+                    self._lag %= TICK_TIME
+                else:
+                    self._update_tick()
+                    self._lag -= TICK_TIME
+
+        # Make the asteroids still to come in a big wave, a few at a time
+        self._wave.prepare()
+
+    def _update_tick(self):
+        # Holding REWIND_KEY runs time backwards, a tick per tick
+        if self._getinput().is_key_down(REWIND_KEY):
+            self._rewind.back()
+        else:
+            self._rewind.update(self._getinput(), TICK_TIME)
+        self._ticks += 1
         if self._wave.getship() is None:
             self._state = STATE_PAUSED
-        if self._wave.getasteroid() == []:
+        # Losing the last life ends the game, even if it cleared the wave
+        if self._wave.getlives() == 0:
             self._state = STATE_COMPLETE
+        elif self._wave.isclear():
+            if self._replay is None and not self._campaign.islast():
+                self._state = STATE_NEXT
+            else:
+                self._state = STATE_COMPLETE
 
     def _update_paused(self):
-        if self._wave.getlives() == 0:
+        if self._wave.getlives() <= 0:
             self._state = STATE_COMPLETE
         else:
-            self._message = GLabel(text="Press 's' to Continue", font_name = MESSAGE_FONT,
-            font_size= MESSAGE_SIZE, x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + MESSAGE_OFFSET) 
-            if self.input.is_key_down('s') and self._sdown == False:
+            self._message = hud.message("Press 's' to Continue")
+            if self._getinput().is_key_down('s') and self._sdown == False:
                 self._state = STATE_CONTINUE
                 self._message = None
                 self._title = None
                 self._sdown = True
 
+    def _update_profiler(self):
+        """
+        Starts a new profiler frame, and turns the profiler on or off on PROFILE_KEY.
+
+        Turning the profiler off writes its trace to PROFILE_FILE.
+        """
+        if self.input.is_key_down(PROFILE_KEY) and not self._pdown:
+            if self._profiler is None:
+                self._profiler = Profiler()
+                self._overlay = GLabel(text='', font_name = PROFILE_FONT,
+                font_size = PROFILE_SIZE, left = 10, top = GAME_HEIGHT - 10)
+            else:
+                self._profiler.dump(PROFILE_FILE)
+                self._profiler = None
+                self._overlay = None
+            if self._wave is not None:
+                self._wave.setprofiler(self._profiler)
+        self._pdown = self.input.is_key_down(PROFILE_KEY)
+
+        if self._profiler is not None:
+            self._profiler.frame()
+            if self._profiler.getframes() % PROFILE_REFRESH == 0:
+                self._overlay.text = self._profiler.summary()
+                self._overlay.left = 10
+                self._overlay.top = GAME_HEIGHT - 10
+
+    def _update_recording(self):
+        """
+        Records this frame, or moves the replay on to the next one.
+
+        The recording is saved to RECORD_FILE whenever the ship is destroyed or the
+        wave is complete, so it is never more than a life behind.
+        """
+        if self._replay is not None:
+            self._replay.advance()
+        elif self._recorder is not None:
+            self._recorder.record(self.input, self._ticks)
+            if self._state == STATE_PAUSED or self._state == STATE_COMPLETE:
+                if self._ticks > 0:
+                    self._recorder.save(RECORD_FILE)
+            if self._state == STATE_COMPLETE:
+                self._recorder = None
+
+    def _update_sounds(self, dt):
+        """
+        Plays the sounds of what happened in the wave this frame.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        if self._sounds is None:
+            return
+        self._sounds.update(dt)
+        if self._wave is not None:
+            self._sounds.play(self._wave.popevents())
+
+    def _update_assets(self):
+        """
+        Does the next step of loading the assets, if there is one left.
+
+        The assets are loaded one step a frame while the title screen is up, so that
+        the first frame is not held up by them. Loading a wave finishes any steps left.
+        """
+        if len(self._assets) == 0:
+            return
+        self._assets.pop(0)()
+        if len(self._assets) == 0:
+            startup.mark('assets')
+            if STARTUP_REPORT:
+                print(startup.report())
+
+    def _load_sounds(self):
+        self._sounds = SoundBank()
+
+    def _load_textures(self):
+        preload_assets()
+
+    def _load_labels(self):
+        for text in ["Game Over", "You Win!"]:
+            hud.title(text)
+        for text in ["Press 's' to Continue", "Press 's' to Restart"]:
+            hud.message(text)
+
+    def _prefetch(self):
+        """
+        Loads what can be loaded away from the main thread, on a background thread.
+
+        This compiles the first wave (which wavefile caches for _load_wave) and imports
+        NumPy if the wave will need it. Anything that makes Kivy textures, sounds or
+        labels must stay on the main thread (see _update_assets).
+        """
+        from kivy.resources import resource_find
+        if NUMPY_PHYSICS:
+            physics.available()
+        name = DEFAULT_WAVE if self._replay is None else self._replay.getwave()
+        path = resource_find(name)
+        if path is not None:
+            wavefile.load(path)
+
+    def _getinput(self):
+        """
+        Returns the input controlling the game: the replay, or else the player.
+        """
+        if self._replay is None:
+            return self.input
+        return self._replay
+
+    def _load_wave(self, name):
+        """
+        Returns the compiled wave in the wave file name.
+
+        Waves are compiled once and cached (see wavefile.py), so loading the same wave
+        again does not read the file unless it has changed. A name of the form
+        GENERATE_PREFIX+'count:seed' is generated instead (see wavefile.generate).
+
+        Parameter name: The wave file
+        Precondition: name is the name of a wave JSON file in the JSON folder, or a
+        generated wave name
+        """
+        if name.startswith(GENERATE_PREFIX):
+            count, seed = name[len(GENERATE_PREFIX):].split(':')
+            return wavefile.generate(int(count), int(seed))
+        from kivy.resources import resource_find
+        path = resource_find(name)
+        if path is None:
+            return wavefile.compile(self.load_json(name))
+        return wavefile.load(path)
+
     def _update_continue(self):
         self._sdown = False
         json = self._wave.getdata()
         self._wave.create_ship(json)
         self._state = STATE_ACTIVE
+        self._lag = 0.0
 
     def _update_complete(self):
         if self._wave.getlives()==0:
-            self._title = GLabel(text="Game Over", font_name = TITLE_FONT, font_size= TITLE_SIZE,
-            x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + TITLE_OFFSET)
-        elif self._wave.getasteroid() == []:
-            self._title = GLabel(text="You Win!", font_name = TITLE_FONT, font_size= TITLE_SIZE,
-            x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + TITLE_OFFSET)
-        self._message = GLabel(text="Press 's' to Restart", font_name = MESSAGE_FONT,
-        font_size= MESSAGE_SIZE, x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + MESSAGE_OFFSET) 
-        if self.input.is_key_down('s') and self._sdown == False:
+            self._title = hud.title("Game Over")
+        elif self._wave.isclear():
+            self._title = hud.title("You Win!")
+        self._message = hud.message("Press 's' to Restart")
+        if self._getinput().is_key_down('s') and self._sdown == False:
             self._state = STATE_LOADING
             self._message = None
             self._title = None
@@ -0,0 +1,117 @@
+"""
+Batch simulation module for Planetoids
+
+This module plays many waves at once without a display, to balance wave files by
+brute force. Each run pairs a wave JSON file with an input script file and plays it
+with headless.simulate. The runs are spread over all cores with a ProcessPoolExecutor.
+
+An input script file is a JSON file with either a list of [frames, keys] steps (see
+headless.ScriptedInput), or a dictionary with that list under the key "steps" and an
+optional boolean "loop" (true by default).
+
+The module can also be run from the command line. It plays every wave with every
+script and prints one line of JSON per run:
+
+    python batch.py --waves wave1.json wave2.json --scripts fire.json --frames 3600
+"""
+from consts import *
+from headless import ScriptedInput, simulate
+from concurrent.futures import ProcessPoolExecutor
+import wavefile
+import json
+import sys
+
+
+def load_script(path):
+    """
+    Returns the ScriptedInput stored in the input script file path.
+
+    Parameter path: The script file
+    Precondition: path is the name of an input script JSON file
+    """
+    assert isinstance(path, str)
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        return ScriptedInput(data['steps'], data.get('loop', True))
+    return ScriptedInput(data)
+
+
+def run_one(wave, script, frames=BATCH_FRAMES, vectorized=NUMPY_PHYSICS):
+    """
+    Returns the result of playing the wave file wave with the script file script.
+
+    The result is the dictionary from headless.simulate, with the extra keys 'wave'
+    and 'script' holding the two file names.
+
+    Parameter wave: The wave file
+    Precondition: wave is the name of a wave JSON file
+
+    Parameter script: The input script file
+    Precondition: script is the name of an input script JSON file
+
+    Parameter frames: The most frames to play
+    Precondition: frames is an int >= 0
+
+    Parameter vectorized: Whether to use the NumPy backend
+    Precondition: vectorized is a bool
+    """
+    result = simulate(wavefile.load(wave), load_script(script), frames, vectorized)
+    result['wave'] = wave
+    result['script'] = script
+    return result
+
+
+def run_batch(runs, frames=BATCH_FRAMES, workers=None, vectorized=NUMPY_PHYSICS):
+    """
+    Returns the results of playing every run in runs, in the same order as runs.
+
+    Each result is a dictionary as returned by run_one. The runs are played in
+    separate processes, at most workers at a time (all the cores if workers is None).
+
+    Parameter runs: The runs to play
+    Precondition: runs is a list of (wave file, script file) pairs
+
+    Parameter frames: The most frames to play of each run
+    Precondition: frames is an int >= 0
+
+    Parameter workers: The most processes to use
+    Precondition: workers is None or an int > 0
+
+    Parameter vectorized: Whether to use the NumPy backend
+    Precondition: vectorized is a bool
+    """
+    assert workers is None or (isinstance(workers, int) and workers > 0)
+    waves = [run[0] for run in runs]
+    scripts = [run[1] for run in runs]
+    count = len(runs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_one, waves, scripts, [frames]*count,
+                                 [vectorized]*count))
+
+
+def main(args):
+    """
+    Plays every wave with every script from the command line and prints the results.
+
+    Parameter args: The command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description='Play Planetoids waves headless.')
+    parser.add_argument('--waves', nargs='+', required=True, help='wave JSON files')
+    parser.add_argument('--scripts', nargs='+', required=True, help='input scripts')
+    parser.add_argument('--frames', type=int, default=BATCH_FRAMES,
+                        help='the most frames to play of each run')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the most processes to use (default: all cores)')
+    parser.add_argument('--numpy', action='store_true',
+                        help='use the NumPy physics backend')
+    options = parser.parse_args(args)
+    runs = [(wave, script) for wave in options.waves for script in options.scripts]
+    for result in run_batch(runs, options.frames, options.workers, options.numpy):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,390 @@
+"""
+Benchmark module for Planetoids
+
+This module measures how fast Wave.update and Wave.draw run on a fixed set of stress
+waves, so that performance regressions show up before a release. Every benchmark
+plays a generated wave of BENCH_SIZES asteroids with one of the fixed input scripts
+in BENCH_SCRIPTS (constant fire, constant thrust, spinning while firing), headless,
+for BENCH_FRAMES frames, and reports the frames per second and the p50/p95 of each
+phase recorded by the profiler.
+
+The stress waves are generated from a fixed seed, so every machine plays the same
+waves. They are built in memory; use --generate to also write them (and the scripts)
+as files for batch.py.
+
+The results can be saved as a baseline and compared against it later. A benchmark
+that is more than BENCH_TOLERANCE slower than its baseline is a regression, and the
+runner exits with status 1:
+
+    python bench.py --save          # record Benchmarks/baseline.json
+    python bench.py                 # compare against it
+    python bench.py --sizes 10 100  # only the small waves
+
+Since the waves are headless, draw measures the work Wave does to draw (syncing and
+placing bodies between ticks), not Kivy.
+
+With --memory, the runner instead measures the memory each asteroid takes, and (if
+game2d is installed) that of the bare GImage every asteroid used to be:
+
+    python bench.py --memory
+
+With --startup, it instead times the part of startup (before the first frame) that
+does not need Kivy: importing the game modules, in a fresh interpreter each run. The
+result is saved and compared under the name 'startup', and the run also fails if a
+module that should be imported lazily (see STARTUP_LAZY) was imported:
+
+    python bench.py --startup --save
+"""
+from consts import *
+from profiler import Profiler
+from headless import ScriptedInput
+from wave import Wave
+import wavefile
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# The folder with the baseline (and the generated files)
+BENCH_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Benchmarks')
+# The baseline results
+BENCH_BASELINE = os.path.join(BENCH_FOLDER, 'baseline.json')
+# The modules app.py imports at startup, apart from those that need game2d or Kivy
+STARTUP_MODULES = ['consts', 'wave', 'profiler', 'replay', 'rewind', 'campaign',
+                   'physics', 'wavefile']
+# The modules that startup must leave to be imported when they are needed
+STARTUP_LAZY = ['numpy']
+
+
+def make_wave(count, seed=BENCH_SEED):
+    """
+    Returns the compiled stress wave with count asteroids.
+
+    The wave is made by wavefile.generate, the same way the game makes a generated
+    wave, from a seed that depends on both seed and count. So the same count and seed
+    always give the same wave.
+
+    Parameter count: The number of asteroids
+    Precondition: count is an int >= 0
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+    """
+    assert isinstance(count, int) and count >= 0
+    return wavefile.generate(count, seed*100003 + count)
+
+
+def run_one(count, script, frames=BENCH_FRAMES, vectorized=NUMPY_PHYSICS):
+    """
+    Returns the results of benchmarking the stress wave of count asteroids.
+
+    The result is a dictionary with the frames per second ('fps') and, for each phase
+    of the profiler, its p50 and p95 in milliseconds (under the keys phase+' p50' and
+    phase+' p95'). The phases are those of Wave.update, plus 'draw' for Wave.draw and
+    'total' for the whole frame. The ship is respawned whenever it is
+    destroyed, ignoring lives, so the wave keeps going until all the asteroids are
+    destroyed or frames frames have been played.
+
+    Parameter count: The number of asteroids
+    Precondition: count is an int >= 0
+
+    Parameter script: The input script
+    Precondition: script is a key of BENCH_SCRIPTS
+
+    Parameter frames: The number of frames to play
+    Precondition: frames is an int > 0
+
+    Parameter vectorized: Whether to use the NumPy backend
+    Precondition: vectorized is a bool
+    """
+    data = make_wave(count)
+    input = ScriptedInput(BENCH_SCRIPTS[script])
+    wave = Wave(data, vectorized, headless=True)
+    prof = Profiler(frames)
+    wave.setprofiler(prof)
+    start = time.perf_counter()
+    played = 0
+    while played < frames and not wave.isclear():
+        prof.frame()
+        prof.start()
+        wave.update(input, TICK_TIME)
+        prof.start()
+        wave.draw(None, 0.5)
+        prof.lap('draw')
+        input.advance()
+        if wave.getship() is None:
+            wave.create_ship(data)
+        played += 1
+    prof.frame()
+    elapsed = time.perf_counter() - start
+
+    result = {'fps': played/elapsed if elapsed > 0 else 0.0}
+    for phase in ['total', 'draw', 'spawn', 'input', 'ship', 'fire', 'collision',
+                  'asteroids', 'bullets']:
+        stats = prof.percentiles(phase)
+        if stats is not None:
+            result[phase+' p50'] = stats[0]
+            result[phase+' p95'] = stats[1]
+    return result
+
+
+def run_all(sizes=BENCH_SIZES, scripts=None, frames=BENCH_FRAMES,
+            vectorized=NUMPY_PHYSICS):
+    """
+    Returns the results of every benchmark as a dictionary keyed by name.
+
+    The name of a benchmark is its size and script, like '1000/fire', followed by
+    '/numpy' if it uses the NumPy backend.
+
+    Parameter sizes: The wave sizes to run
+    Precondition: sizes is a list of ints >= 0
+
+    Parameter scripts: The scripts to run (all of them if None)
+    Precondition: scripts is None or a list of keys of BENCH_SCRIPTS
+
+    Parameter frames: The number of frames to play of each benchmark
+    Precondition: frames is an int > 0
+
+    Parameter vectorized: Whether to use the NumPy backend
+    Precondition: vectorized is a bool
+    """
+    if scripts is None:
+        scripts = sorted(BENCH_SCRIPTS)
+    results = {}
+    for count in sizes:
+        for script in scripts:
+            name = '%d/%s' % (count, script) + ('/numpy' if vectorized else '')
+            results[name] = run_one(count, script, frames, vectorized)
+    return results
+
+
+def compare(results, baseline, tolerance=BENCH_TOLERANCE):
+    """
+    Returns the names of the benchmarks in results that regressed against baseline.
+
+    A benchmark regressed if its frames per second dropped by more than tolerance (as
+    a fraction of the baseline). Benchmarks missing from baseline are skipped.
+
+    Parameter results: The new results
+    Precondition: results is a dictionary returned by run_all
+
+    Parameter baseline: The baseline results
+    Precondition: baseline is a dictionary returned by run_all
+
+    Parameter tolerance: The slowdown allowed
+    Precondition: tolerance is a float >= 0
+    """
+    regressed = []
+    for name in results:
+        if name in baseline:
+            if results[name]['fps'] < baseline[name]['fps']*(1-tolerance):
+                regressed.append(name)
+    return regressed
+
+
+def measure_memory(count=BENCH_MEMORY_COUNT):
+    """
+    Returns the memory taken by one asteroid, in bytes, as a dict.
+
+    The dict maps 'asteroid' to the size of an asteroid as Wave makes it, with the
+    floats of its position and velocity, from models.py if game2d is installed and
+    from headless.py if not. If game2d is installed, it also maps 'gimage' to the size
+    of a bare GImage of an asteroid. Every asteroid used to be such a GImage (with its
+    velocity and status added to the __dict__), so that is a lower bound on what an
+    asteroid took before.
+
+    Each size is the memory allocated while making count of them, divided by count.
+
+    Parameter count: The number of asteroids to make
+    Precondition: count is an int > 0
+    """
+    assert isinstance(count, int) and count > 0
+    try:
+        import models
+        from game2d import GImage
+    except ImportError:
+        import headless as models
+        GImage = None
+    import introcs
+
+    rand = random.Random(BENCH_SEED)
+    points = [(rand.uniform(0, GAME_WIDTH), rand.uniform(0, GAME_HEIGHT))
+              for i in range(count)]
+    result = {}
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        # Adding 0.5 makes floats owned by each asteroid, as in a real wave
+        asteroids = [models.Asteroid(x+0.5, y+0.5, LARGE_RADIUS*2, LARGE_RADIUS*2,
+                                     LARGE_IMAGE, introcs.Vector2(x, y))
+                     for x, y in points]
+        result['asteroid'] = (tracemalloc.get_traced_memory()[0] - start)/count
+        if GImage is not None:
+            start = tracemalloc.get_traced_memory()[0]
+            images = [GImage(x=x, y=y, width=LARGE_RADIUS*2, height=LARGE_RADIUS*2,
+                             source=LARGE_IMAGE) for x, y in points]
+            result['gimage'] = (tracemalloc.get_traced_memory()[0] - start)/count
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def measure_startup(runs=BENCH_STARTUP_RUNS):
+    """
+    Returns the time to import the game modules at startup, as a dict.
+
+    Each run starts a fresh interpreter that imports startup and then STARTUP_MODULES,
+    the way __main__.py does, and marks 'imports' (see startup.py). The dict maps
+    'imports p50' and 'imports max' to the times over the runs, in milliseconds, and
+    'lazy' to the list of modules in STARTUP_LAZY that were imported anyway.
+
+    Parameter runs: The number of interpreters to start
+    Precondition: runs is an int > 0
+    """
+    import subprocess
+    assert isinstance(runs, int) and runs > 0
+    code = ('import startup, sys\n'
+            'import %s\n'
+            'startup.mark("imports")\n'
+            'print(startup.getmark("imports")*1000)\n'
+            'print(" ".join(m for m in %r if m in sys.modules))\n'
+            % (', '.join(STARTUP_MODULES), STARTUP_LAZY))
+    folder = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    lazy = []
+    for run in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=folder, check=True,
+                                capture_output=True, text=True).stdout.split('\n')
+        times.append(float(output[0]))
+        lazy = output[1].split()
+    times.sort()
+    return {'imports p50': times[(runs-1)//2], 'imports max': times[-1], 'lazy': lazy}
+
+
+def generate(folder=BENCH_FOLDER):
+    """
+    Writes every stress wave and input script to folder as JSON files.
+
+    The waves are named stress<size>.json and the scripts <script>.json.
+
+    Parameter folder: The folder to write to
+    Precondition: folder is a string naming a folder (it is created if needed)
+    """
+    os.makedirs(folder, exist_ok=True)
+    for count in BENCH_SIZES:
+        with open(os.path.join(folder, 'stress%d.json' % count), 'w') as file:
+            json.dump(make_wave(count).tojson(), file)
+    for script in BENCH_SCRIPTS:
+        with open(os.path.join(folder, script+'.json'), 'w') as file:
+            json.dump(BENCH_SCRIPTS[script], file)
+
+
+def main(args):
+    """
+    Runs the benchmarks from the command line and reports them.
+
+    Parameter args: The command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark Planetoids waves.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=BENCH_SIZES,
+                        help='the wave sizes to run')
+    parser.add_argument('--scripts', nargs='+', choices=sorted(BENCH_SCRIPTS),
+                        help='the input scripts to run (default: all)')
+    parser.add_argument('--frames', type=int, default=BENCH_FRAMES,
+                        help='the frames to play of each benchmark')
+    parser.add_argument('--numpy', action='store_true',
+                        help='use the NumPy physics backend')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--generate', action='store_true',
+                        help='write the stress waves and scripts to ' + BENCH_FOLDER)
+    parser.add_argument('--memory', action='store_true',
+                        help='measure the memory per asteroid instead')
+    parser.add_argument('--startup', action='store_true',
+                        help='time the startup imports instead')
+    options = parser.parse_args(args)
+    if options.generate:
+        generate()
+
+    if options.memory:
+        sizes = measure_memory()
+        for name in sizes:
+            print('%-18s %9d bytes' % (name, sizes[name]))
+        if 'gimage' in sizes:
+            print('%-18s %9.1fx' % ('reduction >=', sizes['gimage']/sizes['asteroid']))
+        return 0
+
+    baseline = {}
+    if os.path.exists(BENCH_BASELINE):
+        with open(BENCH_BASELINE) as file:
+            baseline = json.load(file)
+
+    if options.startup:
+        return _report_startup(measure_startup(), baseline, options.save)
+
+    results = run_all(options.sizes, options.scripts, options.frames, options.numpy)
+
+    print('%-18s %9s %9s %9s %9s %9s' % ('benchmark', 'fps', 'baseline', 'frame',
+                                         'draw', 'collision'))
+    for name in results:
+        result = results[name]
+        base = baseline[name]['fps'] if name in baseline else float('nan')
+        print('%-18s %9.1f %9.1f %9.3f %9.3f %9.3f' % (name, result['fps'], base,
+              result['total p50'], result['draw p50'], result.get('collision p50', 0)))
+
+    if options.save:
+        baseline.update(results)
+        os.makedirs(BENCH_FOLDER, exist_ok=True)
+        with open(BENCH_BASELINE, 'w') as file:
+            json.dump(baseline, file, indent=1, sort_keys=True)
+        return 0
+
+    regressed = compare(results, baseline)
+    for name in regressed:
+        print('REGRESSION: %s is more than %d%% slower than the baseline'
+              % (name, BENCH_TOLERANCE*100))
+    return 1 if len(regressed) > 0 else 0
+
+
+def _report_startup(result, baseline, save):
+    """
+    Prints the startup result, and saves it or checks it against the baseline.
+
+    Returns the exit status: 1 if the imports are more than BENCH_TOLERANCE slower
+    than the baseline or a module in STARTUP_LAZY was imported, and 0 otherwise.
+
+    Parameter result: The startup result
+    Precondition: result is a dictionary returned by measure_startup
+
+    Parameter baseline: The baseline results
+    Precondition: baseline is a dictionary loaded from BENCH_BASELINE
+
+    Parameter save: Whether to save result as the new baseline
+    Precondition: save is a bool
+    """
+    base = baseline['startup']['imports p50'] if 'startup' in baseline else float('nan')
+    print('%-18s %9s %9s %9s' % ('benchmark', 'p50 ms', 'baseline', 'max ms'))
+    print('%-18s %9.1f %9.1f %9.1f' % ('startup', result['imports p50'], base,
+                                       result['imports max']))
+    status = 0
+    for name in result['lazy']:
+        print('REGRESSION: %s is imported at startup' % name)
+        status = 1
+    if save:
+        baseline['startup'] = result
+        os.makedirs(BENCH_FOLDER, exist_ok=True)
+        with open(BENCH_BASELINE, 'w') as file:
+            json.dump(baseline, file, indent=1, sort_keys=True)
+    elif result['imports p50'] > base*(1+BENCH_TOLERANCE):
+        print('REGRESSION: startup is more than %d%% slower than the baseline'
+              % (BENCH_TOLERANCE*100))
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,455 @@
+"""
+Body behavior module for Planetoids
+
+This module contains the behavior shared by every version of the ship, the bullets,
+and the planetoids: the getters, the movement, turning and thrust, and the splitting
+math. None of it depends on how (or whether) a body is drawn.
+
+The classes here are mixins. They do not have initializers of their own and they do
+not store a position; they expect the class they are mixed into to provide the
+attributes x and y (and angle and width for the ship and asteroids). The ship in
+models.py mixes them into a GImage. The asteroids and bullets in models.py, and all the
+pure-data classes in headless.py, mix them into plain objects, so a wave can be
+simulated without Kivy or game2d.
+
+There can be thousands of asteroids and bullets, so their mixins keep their attributes
+in __slots__ (and so must the classes using them). The ship mixin does not, as the
+ship is a GImage, which has a __dict__ anyway.
+
+Every body also remembers where it was before its last move (see getprevious), so
+that Wave can draw it part of the way between two physics ticks.
+
+Because this module does not import game2d, it is safe to import anywhere.
+"""
+from consts import *
+import introcs
+import math
+
+# PRIMARY RULE: Like models.py, this module is not allowed to access anything in any
+# module other than consts.py.
+
+# HELPER FUNCTION FOR MATH CONVERSION
+def degToRad(deg):
+    """
+    Returns the radian value for the given number of degrees
+    
+    Parameter deg: The degrees to convert
+    Precondition: deg is a float
+    """
+    return math.pi*deg/180
+
+
+# LOOKUP TABLES FOR THE SHIP HEADINGS
+# SHIP_TURN_RATE is a whole number of degrees, so a ship that starts at a whole angle
+# only ever faces one of 360 headings. The vectors for each heading are computed once
+# here and shared by every ship and bullet, so turning and firing do no trig and make
+# no new vectors. They are shared, so NEVER change them in place (no normalize()).
+
+# The unit vector facing each heading
+FACINGS = tuple(introcs.Vector2(math.cos(degToRad(a)), math.sin(degToRad(a)))
+                for a in range(360))
+# The offset from the ship center to the muzzle (where bullets start) at each heading
+MUZZLES = tuple(f * SHIP_RADIUS for f in FACINGS)
+# The velocity of a bullet fired at each heading
+SHOTS = tuple(f * BULLET_SPEED for f in FACINGS)
+
+
+def heading(a):
+    """
+    Returns the index in the lookup tables for the angle a, or None if there is none.
+
+    Only whole angles are in the tables.
+
+    Parameter a: The angle in degrees
+    Precondition: a is an int or float
+    """
+    if a == int(a):
+        return int(a) % 360
+    return None
+
+
+# HELPER FUNCTION FOR COLLISIONS
+def swept_hit(x, y, dx, dy, r):
+    """
+    Returns True if a point that just moved by (dx, dy) to (x, y) came within r of
+    the origin.
+
+    This tests the whole segment the point moved along, not just where it ended up,
+    so nothing is missed however far it moved. To test two moving bodies, give it the
+    position and motion of one relative to the other.
+
+    Parameter x: The horizontal coordinate of the point now
+    Precondition: x is a number
+
+    Parameter y: The vertical coordinate of the point now
+    Precondition: y is a number
+
+    Parameter dx: The horizontal distance the point moved
+    Precondition: dx is a number
+
+    Parameter dy: The vertical distance the point moved
+    Precondition: dy is a number
+
+    Parameter r: The distance that counts as a hit
+    Precondition: r is a number > 0
+    """
+    rr = r*r
+    if x*x + y*y < rr:
+        return True
+    # The closest point to the origin on the segment from (x-dx, y-dy) to (x, y)
+    dd = dx*dx + dy*dy
+    if dd == 0:
+        return False
+    sx = x - dx
+    sy = y - dy
+    t = -(sx*dx + sy*dy)/dd
+    if t >= 1:
+        return False    # Closing in the whole time, so (x, y) was closest
+    if t > 0:
+        sx += t*dx
+        sy += t*dy
+    return sx*sx + sy*sy < rr
+
+
+# ROTATIONS FOR SPLITTING ASTEROIDS
+# A hit asteroid splits into pieces along the hit and rotated 240 and 120 degrees from
+# it. These never change, so they are computed once.
+_SPLIT_COS1 = math.cos(4*math.pi/3)
+_SPLIT_SIN1 = math.sin(4*math.pi/3)
+_SPLIT_COS2 = math.cos(2*math.pi/3)
+_SPLIT_SIN2 = math.sin(2*math.pi/3)
+
+
+def split_directions(vs):
+    """
+    Returns the directions of the rotated pieces for each hit direction in vs.
+
+    The result is a list with a pair (v1, v2) for each v in vs (in order), where v1 is
+    v rotated 240 degrees and v2 is v rotated 120 degrees, both normalized. Splitting
+    all the asteroids hit in a frame with one call saves the calls and lookups of
+    splitting them one at a time.
+
+    Parameter vs: The hit directions
+    Precondition: vs is a list of normalized introcs.Vector2
+    """
+    result = []
+    for v in vs:
+        x1 = v.x*_SPLIT_COS1 - v.y*_SPLIT_SIN1
+        y1 = v.x*_SPLIT_SIN1 + v.y*_SPLIT_COS1
+        l1 = math.sqrt(x1*x1 + y1*y1)
+        x2 = v.x*_SPLIT_COS2 - v.y*_SPLIT_SIN2
+        y2 = v.x*_SPLIT_SIN2 + v.y*_SPLIT_COS2
+        l2 = math.sqrt(x2*x2 + y2*y2)
+        result.append((introcs.Vector2(x1/l1, y1/l1), introcs.Vector2(x2/l2, y2/l2)))
+    return result
+
+
+class BulletBody(object):
+    """
+    A mixin with the behavior of a bullet.
+
+    The class using it must have attributes x and y, and must call _initbullet from its
+    initializer.
+    """
+    # Attribute _vx, _vy: the velocity of the bullet
+    # Invariant: _vx and _vy are floats
+    #
+    # Attribute _buldestroyed: whether the bullet hit something this frame
+    # Invariant: _buldestroyed is a bool
+    #
+    # Attribute _age: the number of frames the bullet has moved
+    # Invariant: _age is an int >= 0
+    #
+    # Attribute _prevx, _prevy: the position before the last move
+    # Invariant: _prevx and _prevy are numbers
+    __slots__ = ('_vx', '_vy', '_buldestroyed', '_age', '_prevx', '_prevy')
+
+    # GETTERS AND SETTERS
+    def getnowdestroyed(self):
+        return self._buldestroyed
+
+    def getvelocity(self):
+        """
+        Returns the velocity of the bullet as a new introcs.Vector2.
+        """
+        return introcs.Vector2(self._vx, self._vy)
+
+    def getvx(self):
+        return self._vx
+
+    def getvy(self):
+        return self._vy
+
+    def getprevious(self):
+        return (self._prevx, self._prevy)
+
+    def setprevious(self, x, y):
+        self._prevx = x
+        self._prevy = y
+
+    def getage(self):
+        return self._age
+
+    def setage(self, value):
+        assert isinstance(value, int) and value >= 0
+        self._age = value
+
+    def setDestroyed(self, value):
+        assert isinstance(value, bool)
+        self._buldestroyed = value
+
+    # INITIALIZER HELPER
+    def _initbullet(self, v):
+        """
+        Initializes the velocity and status of a new bullet.
+
+        Parameter v: The bullet velocity
+        Precondition: v is an introcs.Vector2
+        """
+        assert isinstance(v, introcs.Vector2)
+        self._vx = float(v.x)
+        self._vy = float(v.y)
+        self._buldestroyed = False
+        self._age = 0
+        self._prevx = self.x
+        self._prevy = self.y
+
+    def reset(self, x, y, v):
+        """
+        Reinitializes this bullet as if it had just been fired from (x, y).
+
+        This lets Wave reuse a bullet that is gone instead of making a new one.
+
+        Parameter x: The horizontal coordinate of the bullet center
+        Precondition: x is a float
+
+        Parameter y: The vertical coordinate of the bullet center
+        Precondition: y is a float
+
+        Parameter v: The bullet velocity
+        Precondition: v is an introcs.Vector2
+        """
+        self.x = x
+        self.y = y
+        self._initbullet(v)
+
+    # MOVEMENT
+    def _moving(self):
+        self._prevx = self.x
+        self._prevy = self.y
+        self.x = self.x + self._vx
+        self.y = self.y + self._vy
+        self._age += 1
+
+    def isexpired(self):
+        """
+        Returns True if this bullet should be removed without hitting anything.
+
+        Bullets do not wrap, so a bullet is expired once it is more than BULLET_REACH
+        past the edge of the screen (where it can no longer hit anything) or once it
+        has lived BULLET_LIFETIME frames.
+        """
+        if self._age >= BULLET_LIFETIME:
+            return True
+        if self.x < -BULLET_REACH or self.x > GAME_WIDTH + BULLET_REACH:
+            return True
+        return self.y < -BULLET_REACH or self.y > GAME_HEIGHT + BULLET_REACH
+
+
+class ShipBody(object):
+    """
+    A mixin with the behavior of the ship.
+
+    The class using it must have attributes x, y and angle, and must call _initship
+    from its initializer.
+    """
+    # Attribute _velocity: the velocity of the ship
+    # Invariant: _velocity is an introcs.Vector2 of length at most SHIP_MAX_SPEED
+    #
+    # Attribute _facing: the unit vector the ship is facing
+    # Invariant: _facing is an introcs.Vector2 at the angle of the ship (shared with
+    #            FACINGS, so never changed in place)
+    #
+    # Attribute _muzzle: the offset from the center to where bullets start
+    # Invariant: _muzzle is _facing * SHIP_RADIUS (shared with MUZZLES)
+    #
+    # Attribute _shot: the velocity of a bullet fired now
+    # Invariant: _shot is _facing * BULLET_SPEED (shared with SHOTS)
+    #
+    # Attribute _heading: the index of the angle in the lookup tables
+    # Invariant: _heading is heading(angle)
+    #
+    # Attribute _prevx, _prevy: the position before the last move
+    # Invariant: _prevx and _prevy are numbers
+    __slots__ = ()
+
+    # GETTERS AND SETTERS
+    def getfacing(self):
+        return self._facing
+
+    def getmuzzle(self):
+        return self._muzzle
+
+    def getshot(self):
+        return self._shot
+
+    def getvelocity(self):
+        return self._velocity
+
+    def getprevious(self):
+        return (self._prevx, self._prevy)
+
+    def setprevious(self, x, y):
+        self._prevx = x
+        self._prevy = y
+
+    def setvelocity(self, value):
+        assert isinstance(value, introcs.Vector2)
+        self._velocity = value
+
+    # INITIALIZER HELPER
+    def _initship(self, a):
+        """
+        Initializes the ship at rest, facing the angle a.
+
+        Parameter a: The angle of the ship in degrees
+        Precondition: a is an int or float
+        """
+        assert isinstance(a, (int, float))
+        self._velocity = introcs.Vector2(x=0, y=0)
+        self._heading = heading(a)
+        self._face()
+        self._prevx = self.x
+        self._prevy = self.y
+
+    # MOVEMENT
+    def _turn_left(self):
+        self.angle += SHIP_TURN_RATE
+        if self._heading is not None:
+            self._heading = (self._heading + SHIP_TURN_RATE) % 360
+        self._face()
+
+    def _turn_right(self):
+        self.angle -= SHIP_TURN_RATE
+        if self._heading is not None:
+            self._heading = (self._heading - SHIP_TURN_RATE) % 360
+        self._face()
+
+    def _face(self):
+        """
+        Sets the facing, muzzle and shot of the ship to match its angle.
+
+        They come from the lookup tables, unless the angle is not a whole number.
+        """
+        h = self._heading
+        if h is None:
+            a = degToRad(self.angle)
+            self._facing = introcs.Vector2(math.cos(a), math.sin(a))
+            self._muzzle = self._facing * SHIP_RADIUS
+            self._shot = self._facing * BULLET_SPEED
+        else:
+            self._facing = FACINGS[h]
+            self._muzzle = MUZZLES[h]
+            self._shot = SHOTS[h]
+
+    def _impulse(self):
+        impulse = self._facing * SHIP_IMPULSE 
+        self._velocity = impulse + self._velocity
+        if self._velocity.length() >= SHIP_MAX_SPEED:
+            self._velocity = self._velocity.normalize() * SHIP_MAX_SPEED
+
+    def _moving(self):
+        self._prevx = self.x
+        self._prevy = self.y
+        self.x = self.x + self._velocity.x
+        self.y = self.y + self._velocity.y
+
+
+class AsteroidBody(object):
+    """
+    A mixin with the behavior of an asteroid.
+
+    The class using it must have attributes x, y and width, and must call _initasteroid
+    from its initializer.
+    """
+    # Attribute _vx, _vy: the velocity of the asteroid
+    # Invariant: _vx and _vy are floats
+    #
+    # Attribute _astdestroyed: whether the asteroid was hit this frame
+    # Invariant: _astdestroyed is a bool
+    #
+    # Attribute _prevx, _prevy: the position before the last move
+    # Invariant: _prevx and _prevy are numbers
+    __slots__ = ('_vx', '_vy', '_astdestroyed', '_prevx', '_prevy')
+
+    # GETTERS AND SETTERS
+    def getnowdestroyed(self):
+        return self._astdestroyed
+
+    def getvelocity(self):
+        """
+        Returns the velocity of the asteroid as a new introcs.Vector2.
+        """
+        return introcs.Vector2(self._vx, self._vy)
+
+    def getvx(self):
+        return self._vx
+
+    def getvy(self):
+        return self._vy
+
+    def getprevious(self):
+        return (self._prevx, self._prevy)
+
+    def setprevious(self, x, y):
+        self._prevx = x
+        self._prevy = y
+
+    def setDestroyed(self, value):
+        assert isinstance(value, bool)
+        self._astdestroyed = value
+
+    # INITIALIZER HELPER
+    def _initasteroid(self, v):
+        """
+        Initializes the velocity and status of a new asteroid.
+
+        Parameter v: The asteroid velocity
+        Precondition: v is an introcs.Vector2
+        """
+        assert isinstance(v, introcs.Vector2)
+        self._vx = float(v.x)
+        self._vy = float(v.y)
+        self._astdestroyed = False
+        self._prevx = self.x
+        self._prevy = self.y
+
+    def reset(self, x, y, v):
+        """
+        Reinitializes this asteroid as if it had just been made at (x, y).
+
+        The size (and image) of the asteroid stay the same. This lets Wave reuse an
+        asteroid that was destroyed instead of making a new one.
+
+        Parameter x: The horizontal coordinate of the asteroid center
+        Precondition: x is an int or float
+
+        Parameter y: The vertical coordinate of the asteroid center
+        Precondition: y is an int or float
+
+        Parameter v: The asteroid velocity
+        Precondition: v is an introcs.Vector2
+        """
+        self.x = x
+        self.y = y
+        self._initasteroid(v)
+
+    # MOVEMENT AND SPLITTING
+    def astr_moving(self):
+        self._prevx = self.x
+        self._prevy = self.y
+        self.x = self.x + self._vx
+        self.y = self.y + self._vy
+
+    def resultant_vector(self, v):
+        return list(split_directions([v])[0])
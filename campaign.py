@@ -0,0 +1,152 @@
+"""
+Campaign module for Planetoids
+
+A campaign is a list of waves played in order. Clearing a wave moves straight on to
+the next one, and clearing the last one wins the game. The waves are CAMPAIGN (every
+wave named on the command line, or just DEFAULT_WAVE).
+
+While a wave is being played, the next one is made on a background thread: its file
+is loaded and compiled (see wavefile.py) and every one of its asteroids is made (see
+Wave.prepare). By the time the player clears the current wave the next one is ready,
+so switching to it takes almost no time on the main thread.
+
+Kivy objects must stay on the main thread, and Kivy refuses to make graphics
+instructions anywhere else. The asteroids are pure data, so the background thread
+makes the wave with deferred=True, which leaves out the ship and the batch that draws
+the bodies. The main thread makes those when it takes the wave (see Wave.complete).
+"""
+from consts import *
+from wave import Wave
+import threading
+
+
+class Campaign(object):
+    """
+    A class for an ordered list of waves, which makes each wave ahead of time.
+
+    The method start returns the first wave, and each call to advance returns the
+    next. Both start making the wave after the one they return on a background
+    thread. If that wave is not ready when advance is called, advance waits for it.
+    """
+    # Attribute _names: the waves, in order
+    # Invariant: _names is a nonempty list of wave names (as passed to _load)
+    #
+    # Attribute _load: the function that returns the compiled wave for a name
+    # Invariant: _load is a function taking a wave name that is safe to call from
+    #            any thread (see wavefile.load)
+    #
+    # Attribute _index: the position in _names of the wave being played
+    # Invariant: _index is an int in 0..len(_names)-1
+    #
+    # Attribute _pending: the wave being made on a background thread
+    # Invariant: _pending is None, or a triple (index, thread, result) where index is
+    #            the position in _names of the wave, thread is the Thread making it,
+    #            and result is a list that holds the Wave (or the exception that
+    #            stopped the thread) once the thread is done
+
+    def __init__(self, names, load):
+        """
+        Initializes a campaign of the given waves, at the first wave.
+
+        Parameter names: The waves, in order
+        Precondition: names is a nonempty list of wave names
+
+        Parameter load: The function that returns the compiled wave for a name
+        Precondition: load is a function taking a wave name that is safe to call from
+        any thread
+        """
+        assert isinstance(names, (list, tuple)) and len(names) > 0
+        assert callable(load)
+        self._names = list(names)
+        self._load = load
+        self._index = 0
+        self._pending = None
+
+    def getname(self):
+        return self._names[self._index]
+
+    def getindex(self):
+        return self._index
+
+    def getcount(self):
+        return len(self._names)
+
+    def islast(self):
+        """
+        Returns True if the wave being played is the last one.
+        """
+        return self._index == len(self._names)-1
+
+    def start(self):
+        """
+        Returns the first wave, and starts making the second.
+        """
+        self._index = 0
+        wave = self._take()
+        self._prefetch()
+        return wave
+
+    def advance(self):
+        """
+        Returns the next wave, and starts making the one after.
+
+        The next wave is normally ready by now. If it is not, this waits for it.
+        """
+        assert not self.islast()
+        self._index += 1
+        wave = self._take()
+        self._prefetch()
+        return wave
+
+    # HELPER METHODS
+    def _take(self):
+        """
+        Returns the wave at _index, made ahead of time if it was.
+
+        If the background thread failed to make the wave, this raises the exception
+        that stopped it, just as making the wave here would have.
+        """
+        pending = self._pending
+        self._pending = None
+        if pending is None or pending[0] != self._index:
+            return Wave(self._load(self._names[self._index]))
+        pending[1].join()
+        wave = pending[2][0]
+        if isinstance(wave, Exception):
+            raise wave
+        wave.complete()
+        return wave
+
+    def _prefetch(self):
+        """
+        Starts making the wave after _index on a background thread, if there is one.
+        """
+        if self.islast():
+            return
+        index = self._index+1
+        result = []
+        thread = threading.Thread(target=self._make, args=(self._names[index], result),
+                                  daemon=True)
+        self._pending = (index, thread, result)
+        thread.start()
+
+    def _make(self, name, result):
+        """
+        Makes the wave name with all of its asteroids, and puts it in result.
+
+        This runs on the background thread, so it makes the wave deferred (without the
+        Kivy objects that _take adds). If it fails, it puts the exception in result
+        instead, for _take to raise.
+
+        Parameter name: The wave to make
+        Precondition: name is a wave name
+
+        Parameter result: Where to put the wave
+        Precondition: result is an empty list
+        """
+        try:
+            wave = Wave(self._load(name), deferred=True)
+            wave.prepare(float('inf'))
+            result.append(wave)
+        except Exception as error:
+            result.append(error)
@@ -96,6 +96,8 @@ STATE_PAUSED   = 3
 STATE_CONTINUE = 4
 #: state when the game is complete (won or lost)
 STATE_COMPLETE = 5
+# state when a wave of the campaign is cleared and the next one starts
+STATE_NEXT     = 6
 
 ### FONT CONSTANTS ###
 
@@ -117,6 +119,9 @@ MESSAGE_OFFSET = -70
 
 # The default wave
 DEFAULT_WAVE  = 'wave1.json'
+# The start of a wave name that is generated, not loaded (as in 'generate:10000:7' for
+# 10000 asteroids made from seed 7)
+GENERATE_PREFIX = 'generate:'
 
 ### USE COMMAND LINE ARGUMENTS TO CHANGE DEFAULT LEVEL FILE
 """
@@ -128,14 +133,161 @@ everything after the word python. So if you start the game typing
 Python puts ['planetoids', 'default.json'] into sys.argv. Below, we take advantage of 
 this fact to change the constant DEFAULT_LEVEL. This is the level file to be used when 
 you start the game.  
+
+If the argument is a recording instead (ending in .rec), it is put in REPLAY_FILE and
+the game replays it (see replay.py). If it starts with GENERATE_PREFIX, the wave is
+generated instead of loaded (see wavefile.generate).
+
+If there are several wave arguments, they are played one after the other as a
+campaign (see campaign.py), starting with DEFAULT_WAVE.
 """
-try:
-    file = sys.argv[1]
-    if file[-5:].lower() == '.json':
-        DEFAULT_WAVE = file
+REPLAY_FILE = None
+CAMPAIGN = []
+for file in sys.argv[1:]:
+    if file[-4:].lower() == '.rec':
+        REPLAY_FILE = file
+    elif file[-5:].lower() == '.json' or file.startswith(GENERATE_PREFIX):
+        CAMPAIGN.append(file)
     else:
-        DEFAULT_WAVE = file+'.json'
-except:
-    pass # Use original value
+        CAMPAIGN.append(file+'.json')
+if len(CAMPAIGN) > 0:
+    DEFAULT_WAVE = CAMPAIGN[0]
+else:
+    CAMPAIGN = [DEFAULT_WAVE] # Use original value
 
 ### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
+
+### COLLISION CONSTANTS ###
+
+# The side of a cell in the collision grid (a large planetoid and a bullet span at
+# most three cells in each direction)
+COLLISION_CELL = 2*LARGE_RADIUS
+# The offset that puts the left/bottom edge of the dead zone at cell 0
+COLLISION_ORIGIN = DEAD_ZONE
+# The farthest a bullet can move relative to an asteroid in a tick, which the swept
+# collisions have to look for bullets within
+COLLISION_SWEEP = BULLET_SPEED + max(SMALL_SPEED, MEDIUM_SPEED, LARGE_SPEED)
+
+### BULLET LIFETIME CONSTANTS ###
+
+# How far past the screen edge a bullet can still hit a planetoid in the dead zone
+BULLET_REACH = DEAD_ZONE + LARGE_RADIUS + BULLET_RADIUS
+# The number of frames a bullet lives (enough to cross the screen and BULLET_REACH)
+BULLET_LIFETIME = 150
+# The most bullets that may be on screen at once (the ship cannot fire past this)
+BULLET_MAX = 32
+
+### PHYSICS CONSTANTS ###
+
+# Whether to move the asteroids and bullets with the NumPy backend (needs numpy)
+NUMPY_PHYSICS = False
+
+### BATCH CONSTANTS ###
+
+# The most frames a batch simulation plays of each wave (five minutes at 60 fps)
+BATCH_FRAMES = 18000
+
+### TIMING CONSTANTS ###
+
+# The number of physics ticks per second (every speed above is per tick)
+TICK_RATE = 60
+# The length of a physics tick in seconds
+TICK_TIME = 1/TICK_RATE
+# The most ticks to run in one frame to catch up after a slow frame
+MAX_TICKS = 5
+
+### PROFILER CONSTANTS ###
+
+# The key that turns the frame profiler (and its overlay) on and off
+PROFILE_KEY = 'p'
+# The number of frames the profiler keeps for its statistics and trace
+PROFILE_WINDOW = 600
+# The number of frames between updates of the profiler overlay
+PROFILE_REFRESH = 30
+# The file the profiler trace is written to when the profiler is turned off
+# (CSV if it ends in .csv, JSON otherwise)
+PROFILE_FILE = 'profile.csv'
+# The font for the profiler overlay
+PROFILE_FONT = MESSAGE_FONT
+# The font size for the profiler overlay
+PROFILE_SIZE = 16
+
+### BENCHMARK CONSTANTS ###
+
+# The number of asteroids in each stress wave
+BENCH_SIZES = [10, 100, 1000, 10000]
+# The input scripts for the benchmarks (see headless.ScriptedInput)
+BENCH_SCRIPTS = {'fire': [[1, ['spacebar']]], 'thrust': [[1, ['up']]],
+                 'spin': [[1, ['left', 'spacebar']]]}
+# The number of frames each benchmark plays
+BENCH_FRAMES = 300
+# The random seed for the stress waves
+BENCH_SEED = 1110
+# The slowdown (as a fraction of the baseline frames per second) that is a regression
+BENCH_TOLERANCE = 0.25
+# The number of asteroids made to measure the memory of one (see bench.measure_memory)
+BENCH_MEMORY_COUNT = 10000
+# The number of fresh interpreters started to time the startup imports
+BENCH_STARTUP_RUNS = 10
+
+### REPLAY CONSTANTS ###
+
+# The keys recorded each frame, in the order of their bits in a recording
+REPLAY_KEYS = ('left', 'right', 'up', 'spacebar', 's', 'r')
+# The file the last wave played is recorded to
+RECORD_FILE = 'last.rec'
+
+### DRAWING CONSTANTS ###
+
+# Whether to draw all the asteroids and bullets in a few meshes (see models.BodyBatch)
+# instead of with a GObject for each one on screen (see models.BodySprites)
+BATCH_DRAW = True
+# The number of triangles in the disk of a bullet drawn in a batch
+BULLET_SEGMENTS = 8
+# The most vertices in one Kivy mesh (its indices are 16 bit ints)
+MESH_VERTICES = 65536
+
+### HUD CONSTANTS ###
+
+# The font for the lives and score
+HUD_FONT = MESSAGE_FONT
+# The font size of the lives and score
+HUD_SIZE = 32
+# The distance of the lives and score from the top (and left) of the screen
+HUD_MARGIN = 20
+
+### SOUND CONSTANTS ###
+
+# The events a wave reports (see Wave.popevents)
+EVENT_NAMES = ('fire', 'split', 'crash')
+# The sound of each event, as (sound file, voices, seconds between plays). The voices
+# are how many copies of the sound can play at once. Events without a sound are silent.
+SOUNDS = {'fire': ('pew2.wav', 3, 0.05)}
+
+### STARTUP CONSTANTS ###
+
+# Whether to print how long startup took once the assets are loaded (see startup.py)
+STARTUP_REPORT = False
+
+### REWIND CONSTANTS ###
+
+# The key to hold down to rewind the wave (it must be in REPLAY_KEYS)
+REWIND_KEY = 'r'
+# The most ticks between keyframes of the rewind history
+REWIND_KEYFRAME = 60
+# The most snapshot bytes made again by one step back (big waves have keyframes more
+# often to keep within it, see rewind.py)
+REWIND_REPLAY_BYTES = 256*1024
+# The most memory the rewind history may use, in bytes
+REWIND_BYTES = 32*1024*1024
+
+### STREAMING CONSTANTS ###
+
+# The most asteroids of a wave that appear in one tick (the rest appear in later ticks)
+STREAM_RATE = 250
+# The time (in seconds) each frame may spend making the asteroids still to appear
+STREAM_BUDGET = 0.004
+# The weights of the small, medium and large sizes in a generated wave
+GENERATE_MIX = (1, 1, 1)
+# How close to the ship a generated asteroid may start
+GENERATE_CLEARANCE = 150
@@ -0,0 +1,256 @@
+"""
+Headless simulation module for Planetoids
+
+This module lets a wave be played without a display, Kivy, or game2d. It has three
+pure-data stand-ins for the classes in models.py, a scripted replacement for GInput,
+and a function that plays a wave the way the Planetoids application would.
+
+The stand-ins get all of their behavior from the mixins in bodies.py, exactly like the
+model classes, so a headless game has the same outcome as the windowed game with the
+same input. The asteroids and bullets in models.py are pure data already, and differ
+from these only in how they are drawn (see models.BodyBatch). The headless ship is
+not a GImage, and drawing it does nothing.
+
+To simulate a wave, make a Wave with headless=True (or just call simulate):
+
+    wave = Wave(data, headless=True)
+    script = ScriptedInput([[30, ['up']], [20, ['left', 'spacebar']]])
+    result = simulate(data, script, 3600)
+"""
+from consts import *
+from bodies import *
+
+
+class Bullet(BulletBody):
+    """
+    A class representing a bullet without a GEllipse to draw it.
+    """
+    # Attribute x: the horizontal coordinate of the bullet center
+    # Invariant: x is a float
+    #
+    # Attribute y: the vertical coordinate of the bullet center
+    # Invariant: y is a float
+    #
+    # Attribute width, height: the size of the bullet
+    # Invariant: width and height are BULLET_RADIUS*2
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x, y, v):
+        assert isinstance(x, float)
+        assert isinstance(y, float)
+        self.x = x
+        self.y = y
+        self.width = BULLET_RADIUS*2
+        self.height = BULLET_RADIUS*2
+        self._initbullet(v)
+
+
+class Ship(ShipBody):
+    """
+    A class representing the ship without a GImage to draw it.
+    """
+    # Attribute x: the horizontal coordinate of the ship center
+    # Invariant: x is an int or float
+    #
+    # Attribute y: the vertical coordinate of the ship center
+    # Invariant: y is an int or float
+    #
+    # Attribute angle: the angle of the ship in degrees
+    # Invariant: angle is an int or float
+    #
+    # Attribute width, height: the size of the ship
+    # Invariant: width and height are SHIP_RADIUS*2
+
+    def __init__(self, x, y, a):
+        assert isinstance(x, (int, float))
+        assert isinstance(y, (int, float))
+        self.x = x
+        self.y = y
+        self.angle = a
+        self.width = SHIP_RADIUS*2
+        self.height = SHIP_RADIUS*2
+        self._initship(a)
+
+    def draw(self, view):
+        """
+        Does nothing, as a headless ship cannot be seen.
+        """
+        pass
+
+
+class Asteroid(AsteroidBody):
+    """
+    A class representing an asteroid without a GImage to draw it.
+    """
+    # Attribute x: the horizontal coordinate of the asteroid center
+    # Invariant: x is an int or float
+    #
+    # Attribute y: the vertical coordinate of the asteroid center
+    # Invariant: y is an int or float
+    #
+    # Attribute width, height: the size of the asteroid
+    # Invariant: width and height are twice the radius of its size
+    #
+    # Attribute source: the image the asteroid would be drawn with
+    # Invariant: source is a string
+    __slots__ = ('x', 'y', 'width', 'height', 'source')
+
+    def __init__(self, x, y, width, height, source, v):
+        assert isinstance(x, (int, float))
+        assert isinstance(y, (int, float))
+        assert isinstance(width, (int, float))
+        assert isinstance(height, (int, float))
+        assert isinstance(source, str)
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.source = source
+        self._initasteroid(v)
+
+
+class BodyBatch(object):
+    """
+    A class standing in for models.BodyBatch, which draws nothing.
+    """
+
+    def draw(self, view, asteroids, bullets):
+        """
+        Does nothing, as headless bodies cannot be seen.
+        """
+        pass
+
+
+# Drawing bodies one by one draws nothing either
+BodySprites = BodyBatch
+
+
+def preload_textures():
+    """
+    Does nothing, as headless bodies have no images (see models.preload_textures).
+    """
+    pass
+
+
+class ScriptedInput(object):
+    """
+    A class that replaces GInput with a fixed script of key presses.
+
+    A script is a list of steps. Each step is a pair [frames, keys], meaning that the
+    keys in the list keys are held down (and all others are up) for the given number of
+    frames. When the script runs out it starts over from the beginning, unless loop is
+    False, in which case no keys are down from then on.
+
+    Like GInput, the keys are read with is_key_down. Unlike GInput, time only passes
+    when advance is called, which should happen once per frame.
+    """
+    # Attribute _steps: the script
+    # Invariant: _steps is a list of (int, frozenset) pairs, each int > 0
+    #
+    # Attribute _loop: whether to restart the script when it runs out
+    # Invariant: _loop is a bool
+    #
+    # Attribute _step: the current step
+    # Invariant: _step is an int >= 0 and <= len(_steps)
+    #
+    # Attribute _frame: the number of frames spent in the current step
+    # Invariant: _frame is an int >= 0
+    #
+    # Attribute _keys: the keys currently down
+    # Invariant: _keys is a frozenset of strings
+
+    def __init__(self, steps, loop=True):
+        """
+        Initializes the input at the start of the script.
+
+        Parameter steps: The script
+        Precondition: steps is a nonempty list of [frames, keys] pairs, where frames is
+        an int > 0 and keys is a list of key names (as used by GInput)
+
+        Parameter loop: Whether to restart the script when it runs out
+        Precondition: loop is a bool
+        """
+        assert isinstance(steps, (list, tuple)) and len(steps) > 0
+        assert isinstance(loop, bool)
+        self._steps = []
+        for step in steps:
+            assert isinstance(step[0], int) and step[0] > 0, repr(step)
+            self._steps.append((step[0], frozenset(step[1])))
+        self._loop = loop
+        self._step = 0
+        self._frame = 0
+        self._keys = self._steps[0][1]
+
+    def is_key_down(self, key):
+        """
+        Returns True if key is held down this frame.
+
+        Parameter key: The key to check
+        Precondition: key is a string
+        """
+        return key in self._keys
+
+    def advance(self):
+        """
+        Moves the script forward one frame.
+        """
+        if self._step == len(self._steps):
+            return
+        self._frame += 1
+        if self._frame == self._steps[self._step][0]:
+            self._frame = 0
+            self._step += 1
+            if self._step == len(self._steps) and self._loop:
+                self._step = 0
+            if self._step < len(self._steps):
+                self._keys = self._steps[self._step][1]
+            else:
+                self._keys = frozenset()
+
+
+def simulate(data, input, frames, vectorized=NUMPY_PHYSICS):
+    """
+    Returns the outcome of playing the wave data for at most frames frames.
+
+    The wave is played the way the Planetoids application plays it, except that
+    nothing is drawn and that the player always continues right away after losing a
+    ship (the windowed game waits for 's', but the wave does not move while it waits).
+    The game ends when all the asteroids are destroyed, when the last life is lost, or
+    after the given number of frames.
+
+    The outcome is a dictionary with the keys 'frames' (the number of frames played),
+    'lives' (the lives left), 'asteroids' (the asteroids left), 'destroyed' (the
+    asteroids destroyed, counting each piece of a split) and 'won' (True if all
+    the asteroids were destroyed without losing the last life, which is when the
+    application says "You Win!").
+
+    Parameter data: The wave data
+    Precondition: data is a wavefile.CompiledWave or a dict loaded from a wave JSON file
+
+    Parameter input: The player input
+    Precondition: input is a ScriptedInput (or any object with the methods
+    is_key_down and advance)
+
+    Parameter frames: The most frames to play
+    Precondition: frames is an int >= 0
+
+    Parameter vectorized: Whether to use the NumPy backend
+    Precondition: vectorized is a bool
+    """
+    from wave import Wave
+    assert isinstance(frames, int) and frames >= 0
+    wave = Wave(data, vectorized, headless=True)
+    played = 0
+    while played < frames:
+        wave.update(input, 1/60)
+        input.advance()
+        played += 1
+        if wave.isclear():
+            break
+        if wave.getship() is None:
+            if wave.getlives() == 0:
+                break
+            wave.create_ship(wave.getdata())
+    return {'frames': played, 'lives': wave.getlives(),
+            'asteroids': len(wave.getasteroid()), 'destroyed': wave.getdestroyed(),
+            'won': wave.getlives() > 0 and wave.isclear()}
@@ -0,0 +1,165 @@
+"""
+Heads-up display module for Planetoids
+
+This module contains the text the Planetoids application shows on screen: the title
+and message of each state, and the lives and score shown while playing.
+
+Making a GLabel loads its font and lays out its text, which is far too slow to do
+every frame. So the titles and messages are made once, the first time they are shown,
+and reused from then on (see title and message). The lives and score are HudText,
+which only lay their text out again when the value they show has changed.
+
+This module uses game2d, and like app.py, it only gets information about the wave
+from the application (through the getters of Wave).
+"""
+from consts import *
+from game2d import *
+
+# The titles made so far, keyed by their text
+_TITLES = {}
+# The messages made so far, keyed by their text
+_MESSAGES = {}
+
+
+def title(text):
+    """
+    Returns the title label with the given text.
+
+    The label is made the first time and reused after, so do not change it.
+
+    Parameter text: The title text
+    Precondition: text is a string
+    """
+    if text not in _TITLES:
+        _TITLES[text] = GLabel(text=text, font_name = TITLE_FONT, font_size= TITLE_SIZE,
+        x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + TITLE_OFFSET)
+    return _TITLES[text]
+
+
+def message(text):
+    """
+    Returns the message label with the given text.
+
+    The label is made the first time and reused after, so do not change it.
+
+    Parameter text: The message text
+    Precondition: text is a string
+    """
+    if text not in _MESSAGES:
+        _MESSAGES[text] = GLabel(text=text, font_name = MESSAGE_FONT,
+        font_size= MESSAGE_SIZE, x =GAME_WIDTH/2, y = GAME_HEIGHT/2 + MESSAGE_OFFSET)
+    return _MESSAGES[text]
+
+
+class HudText(object):
+    """
+    A class for a line of text showing a value that changes now and then.
+
+    The text is the value put in a format string, laid out at a fixed corner. Setting
+    the value to what it already is does nothing, so it is fine to set it every frame;
+    the label is only laid out again when it is next drawn after a change.
+    """
+    # Attribute _label: the label drawn
+    # Invariant: _label is a GLabel
+    #
+    # Attribute _format: the format of the text, with one % for the value
+    # Invariant: _format is a string
+    #
+    # Attribute _value: the value shown
+    # Invariant: _value is any value that fits _format, or None before it is set
+    #
+    # Attribute _dirty: whether the label text is out of date
+    # Invariant: _dirty is a bool
+    #
+    # Attribute _left, _top: the top left corner of the text
+    # Invariant: _left and _top are numbers
+
+    def getvalue(self):
+        return self._value
+
+    def setvalue(self, value):
+        if value != self._value:
+            self._value = value
+            self._dirty = True
+
+    def __init__(self, format, left, top):
+        """
+        Initializes a line of text with no value, at the given top left corner.
+
+        Parameter format: The format of the text, with one % for the value
+        Precondition: format is a string
+
+        Parameter left: The left edge of the text
+        Precondition: left is a number
+
+        Parameter top: The top edge of the text
+        Precondition: top is a number
+        """
+        assert isinstance(format, str)
+        self._label = GLabel(text='', font_name = HUD_FONT, font_size = HUD_SIZE,
+        left = left, top = top)
+        self._format = format
+        self._value = None
+        self._dirty = False
+        self._left = left
+        self._top = top
+
+    def draw(self, view):
+        """
+        Draws the text to view, laying it out first if the value has changed.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView
+        """
+        if self._value is None:
+            return
+        if self._dirty:
+            self._label.text = self._format % self._value
+            self._label.left = self._left
+            self._label.top = self._top
+            self._dirty = False
+        self._label.draw(view)
+
+
+class Hud(object):
+    """
+    A class for the lives and score shown while a wave is played.
+
+    The score is the number of asteroids destroyed.
+    """
+    # Attribute _lives: the lives left
+    # Invariant: _lives is a HudText
+    #
+    # Attribute _score: the score
+    # Invariant: _score is a HudText
+
+    def __init__(self):
+        """
+        Initializes the display with no lives or score.
+        """
+        self._lives = HudText('Lives: %d', HUD_MARGIN, GAME_HEIGHT - HUD_MARGIN)
+        self._score = HudText('Score: %d', GAME_WIDTH/2 + HUD_MARGIN,
+                              GAME_HEIGHT - HUD_MARGIN)
+
+    def update(self, lives, score):
+        """
+        Sets the lives and score to show.
+
+        Parameter lives: The lives left
+        Precondition: lives is an int >= 0
+
+        Parameter score: The score
+        Precondition: score is an int >= 0
+        """
+        self._lives.setvalue(lives)
+        self._score.setvalue(score)
+
+    def draw(self, view):
+        """
+        Draws the lives and score to view.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView
+        """
+        self._lives.draw(view)
+        self._score.draw(view)
@@ -20,6 +20,8 @@ make a new class or not, please ask on Ed Discussions.
 from consts import *
 from game2d import *
 from introcs import *
+from bodies import *
+import textures
 import math
 
 # PRIMARY RULE: Models are not allowed to access anything in any module other than
@@ -27,69 +29,50 @@ import math
 # parameter in your method, and Wave should pass it as a argument when it calls 
 # the method.
 
-# START REMOVE
-# HELPER FUNCTION FOR MATH CONVERSION
-def degToRad(deg):
-    """
-    Returns the radian value for the given number of degrees
-    
-    Parameter deg: The degrees to convert
-    Precondition: deg is a float
-    """
-    return math.pi*deg/180
-# END REMOVE
+# The getters, movement and splitting of each model are in the mixins in bodies.py,
+# which are shared with the pure-data bodies in headless.py. The ship adds the GImage
+# that draws it. The asteroids and bullets are pure data in __slots__, and are drawn
+# by BodyBatch or BodySprites, which only make GObjects for what is on screen.
 
-class Bullet(GEllipse):
+class Bullet(BulletBody):
     """
     A class representing a bullet from the ship
-    
-    Bullets are typically just white circles (ellipses). The size of the bullet is 
-    determined by constants in consts.py. However, we MUST subclass GEllipse, because 
-    we need to add an extra attribute for the velocity of the bullet.
-    
-    The class Wave will need to look at this velocity, so you will need getters for
-    the velocity components. However, it is possible to write this assignment with no 
-    setters for the velocities. That is because the velocity is fixed and cannot change 
-    once the bolt is fired.
-    
-    In addition to the getters, you need to write the __init__ method to set the starting
-    velocity. This __init__ method will need to call the __init__ from GEllipse as a
-    helper. This init will need a parameter to set the direction of the velocity.
-    
-    You also want to create a method to update the bolt. You update the bolt by adding
-    the velocity to the position. While it is okay to add a method to detect collisions
-    in this class, you may find it easier to process collisions in wave.py.
-    """
-    # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
-    
-    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
-    def getnowdestroyed(self):
-        return self._buldestroyed
 
-    def getvelocity(self):
-        return self._velocity
+    Bullets are drawn as white circles, with a size set by constants in consts.py. A
+    wave can have thousands of bullets, so a bullet is pure data: its position and size
+    here, and its velocity, age and status in BulletBody, all kept in __slots__ with no
+    per-instance __dict__. A bullet has no GEllipse of its own. BodyBatch (or
+    BodySprites, which only makes GEllipses for bullets on screen) draws it.
 
-    def setDestroyed(self, value):
-        assert isinstance(value, bool)
-        self._buldestroyed = value
+    The velocity is fixed once the bullet is fired, so it has getters but no setter.
+    The movement is in BulletBody, and the collisions are processed in wave.py.
+    """
+    # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
+    # See BulletBody
+    #
+    # Attribute x: the horizontal coordinate of the bullet center
+    # Invariant: x is a float
+    #
+    # Attribute y: the vertical coordinate of the bullet center
+    # Invariant: y is a float
+    #
+    # Attribute width, height: the size of the bullet
+    # Invariant: width and height are BULLET_RADIUS*2
+    __slots__ = ('x', 'y', 'width', 'height')
 
     # INITIALIZER TO SET THE POSITION AND VELOCITY
     def __init__(self, x, y, v):
         assert isinstance(x, float)
         assert isinstance(y, float)
         assert isinstance(v, introcs.Vector2)
-        super().__init__(x=x, y=y, width=BULLET_RADIUS*2,
-        height= BULLET_RADIUS*2, fillcolor = BULLET_COLOR)
-        self._velocity = v
-        self._buldestroyed = False
-
-    # ADDITIONAL METHODS (MOVEMENT, COLLISIONS, ETC)
-    def _moving(self):
-        self.x = self.x + self._velocity.x
-        self.y = self.y + self._velocity.y
+        self.x = x
+        self.y = y
+        self.width = BULLET_RADIUS*2
+        self.height = BULLET_RADIUS*2
+        self._initbullet(v)
 
 
-class Ship(GImage):
+class Ship(ShipBody, GImage):
     """
     A class to represent the game ship.
     
@@ -112,13 +95,7 @@ class Ship(GImage):
     in this class, you may find it easier to process collisions in wave.py.
     """
     # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
-    
-    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
-    def getfacing(self):
-        return self._facing
-
-    def getvelocity(self):
-        return self._velocity
+    # See ShipBody
 
     # INITIALIZER TO CREATE A NEW SHIP
     def __init__(self, x, y, a):
@@ -127,63 +104,40 @@ class Ship(GImage):
         assert isinstance(a, (int, float))
         super().__init__(x = x, y = y, width = SHIP_RADIUS*2,
         height = SHIP_RADIUS*2, source = SHIP_IMAGE, angle = a)
-        self._velocity = introcs.Vector2(x=0, y=0)
-        self._facing = introcs.Vector2(math.cos(degToRad(a)), math.sin(degToRad(a)))
+        self._initship(a)
 
-    # ADDITIONAL METHODS (MOVEMENT, COLLISIONS, ETC)
-    def _turn_left(self):
-        self.angle += SHIP_TURN_RATE
-        a = degToRad(self.angle)
-        self._facing = introcs.Vector2(math.cos(a), math.sin(a))
 
-    def _turn_right(self):
-        self.angle -= SHIP_TURN_RATE
-        a = degToRad(self.angle)
-        self._facing = introcs.Vector2(math.cos(a), math.sin(a))
-
-    def _impulse(self):
-        impulse = self._facing * SHIP_IMPULSE 
-        self._velocity = impulse + self._velocity
-        if self._velocity.length() >= SHIP_MAX_SPEED:
-            self._velocity = self._velocity.normalize() * SHIP_MAX_SPEED
-
-    def _moving(self):
-        self.x = self.x + self._velocity.x
-        self.y = self.y + self._velocity.y
-
-
-class Asteroid(GImage):
+class Asteroid(AsteroidBody):
     """
     A class to represent a single asteroid.
-    
-    Asteroids are typically are represented by images. Asteroids come in three 
-    different sizes (SMALL_ASTEROID, MEDIUM_ASTEROID, and LARGE_ASTEROID) that 
-    determine the choice of image and asteroid radius. We MUST subclass GImage, because 
-    we need extra attributes for both the size and the velocity of the asteroid.
-    
-    The class Wave will need to look at the size and velocity, so you will need getters 
-    for them.  However, it is possible to write this assignment with no setters for 
-    either of these. That is because they are fixed and cannot change when the planetoid 
-    is created. 
-    
-    In addition to the getters, you need to write the __init__ method to set the size
-    and starting velocity. Note that the SPEED of an asteroid is defined in const.py,
-    so the only thing that differs is the velocity direction.
-    
-    You also want to create a method to update the asteroid. You update the asteroid 
-    by adding the velocity to the position. While it is okay to add a method to detect 
-    collisions in this class, you may find it easier to process collisions in wave.py.
-    """
-    # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
-    
 
-    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
-    def getnowdestroyed(self):
-        return self._astdestroyed
+    Asteroids come in three different sizes (SMALL_ASTEROID, MEDIUM_ASTEROID, and
+    LARGE_ASTEROID) that determine the image, the radius and the speed of the asteroid.
+    A wave can have thousands of asteroids, most of them off screen in a big wave, so an
+    asteroid is pure data: its position, size and image here, and its velocity and
+    status in AsteroidBody, all kept in __slots__ with no per-instance __dict__. An
+    asteroid has no GImage of its own. BodyBatch (or BodySprites, which only makes
+    GImages for asteroids on screen) draws it.
 
-    def setDestroyed(self, value):
-        assert isinstance(value, bool)
-        self._astdestroyed = value
+    The size and velocity are fixed when the asteroid is made (or reset from the pool),
+    so they have getters but no setters. The movement and splitting are in
+    AsteroidBody, and the collisions are processed in wave.py.
+    """
+    # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
+    # See AsteroidBody
+    #
+    # Attribute x: the horizontal coordinate of the asteroid center
+    # Invariant: x is an int or float
+    #
+    # Attribute y: the vertical coordinate of the asteroid center
+    # Invariant: y is an int or float
+    #
+    # Attribute width, height: the size of the asteroid
+    # Invariant: width and height are twice the radius of its size
+    #
+    # Attribute source: the image the asteroid is drawn with
+    # Invariant: source is the image of its size (e.g. SMALL_IMAGE)
+    __slots__ = ('x', 'y', 'width', 'height', 'source')
 
     # INITIALIZER TO CREATE A NEW ASTEROID
     def __init__(self, x, y, width, height, source, v):
@@ -193,26 +147,310 @@ class Asteroid(GImage):
         assert isinstance(height, (int, float))
         assert isinstance(source, str)
         assert isinstance(v, introcs.Vector2)
-        super().__init__(x=x, y=y, width = width , height = height , source =source) 
-        self._velocity = v
-        self._astdestroyed = False
-        
-    # ADDITIONAL METHODS (MOVEMENT, COLLISIONS, ETC)
-    def astr_moving(self):
-        self.x = self.x + self._velocity.x
-        self.y = self.y + self._velocity.y
-
-    def resultant_vector(self, v):
-        vector1  = introcs.Vector2(v.x*math.cos(4*(math.pi)/3)
-        - v.y * math.sin(4*(math.pi)/3), v.x*math.sin(4*(math.pi)/3)
-        + v.y*math.cos(4*(math.pi)/3)).normalize()
-        vector2 = introcs.Vector2(v.x*math.cos(2*(math.pi)/3)
-        - v.y * math.sin(2*(math.pi)/3), v.x*math.sin(2*(math.pi)/3)
-        + v.y*math.cos(2*(math.pi)/3)).normalize()
-        list = [vector1,vector2]
-        return list
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.source = source
+        self._initasteroid(v)
 
-    
+
+# HELPER FUNCTION FOR LOADING IMAGES
+def preload_textures():
+    """
+    Loads the images of the ship and asteroids (see textures.py) ahead of time.
+
+    Wave calls this when it is built, so that spawning a body never loads an image.
+    """
+    textures.preload()
 
 
 # IF YOU NEED ADDITIONAL MODEL CLASSES, THEY GO HERE
+class BodyBatch(object):
+    """
+    A class to draw every asteroid and bullet with a handful of Kivy meshes.
+
+    Drawing each asteroid and bullet on its own adds a Kivy instruction per body every
+    frame, which costs more than moving them once there are hundreds. Instead, this
+    class keeps one textured mesh for each asteroid image and one mesh for all the
+    bullets, and draws those. Each frame it writes the corners of every body into the
+    vertex list of its mesh, reusing the list (and only remaking the indices when the
+    number of bodies changes).
+
+    The bodies themselves are pure data, which this class only reads the position and
+    size of. Bodies off screen are skipped. Kivy indexes a mesh with 16 bit ints, so a
+    mesh can hold at most 16384 asteroids (or 7281 bullets); past that, the bodies are
+    split over more meshes (see _MeshBuffer).
+    """
+    # Attribute _group: the instructions drawing all the meshes
+    # Invariant: _group is a Kivy InstructionGroup
+    #
+    # Attribute _meshes: the asteroid meshes
+    # Invariant: _meshes is a dict from image name to a _MeshBuffer with a quad (4
+    #            vertices, 6 indices) for each asteroid with that image
+    #
+    # Attribute _bullets: the bullet mesh
+    # Invariant: _bullets is a _MeshBuffer with a disk (BULLET_SEGMENTS+1 vertices,
+    #            3*BULLET_SEGMENTS indices) for each bullet
+
+    def __init__(self):
+        """
+        Initializes the batch with an empty mesh for each asteroid image and the bullets.
+
+        The asteroids are drawn first and the bullets on top of them.
+        """
+        from kivy.graphics import InstructionGroup, Color
+        self._group = InstructionGroup()
+        self._group.add(Color(1, 1, 1, 1))
+        self._meshes = {}
+        for source, radius in [(LARGE_IMAGE, LARGE_RADIUS), (MEDIUM_IMAGE, MEDIUM_RADIUS),
+                               (SMALL_IMAGE, SMALL_RADIUS)]:
+            texture = textures.get(source, radius*2, radius*2)
+            tc = texture.tex_coords
+            corners = [(-1, -1, tc[0], tc[1]), (1, -1, tc[2], tc[3]),
+                       (1, 1, tc[4], tc[5]), (-1, 1, tc[6], tc[7])]
+            self._meshes[source] = _MeshBuffer(texture, (corners, [0, 1, 2, 2, 3, 0]))
+            self._group.add(self._meshes[source].group)
+        self._group.add(Color(*RGB.CreateName(BULLET_COLOR).glColor()))
+        self._bullets = _MeshBuffer(None, _disk())
+        self._group.add(self._bullets.group)
+
+    def draw(self, view, asteroids, bullets):
+        """
+        Draws the asteroids and bullets to view.
+
+        Parameter view: The game view
+        Precondition: view is a GView
+
+        Parameter asteroids: The asteroids to draw
+        Precondition: asteroids is a list of Asteroid
+
+        Parameter bullets: The bullets to draw
+        Precondition: bullets is a list of Bullet
+        """
+        for buffer in self._meshes.values():
+            buffer.start()
+        for asteroid in asteroids:
+            r = asteroid.width/2
+            if _onscreen(asteroid.x, asteroid.y, r):
+                self._meshes[asteroid.source].add(asteroid.x, asteroid.y, r, r)
+        for buffer in self._meshes.values():
+            buffer.finish()
+
+        self._bullets.start()
+        for bullet in bullets:
+            if _onscreen(bullet.x, bullet.y, BULLET_RADIUS):
+                self._bullets.add(bullet.x, bullet.y, BULLET_RADIUS, BULLET_RADIUS)
+        self._bullets.finish()
+        view.draw(self._group)
+
+
+class BodySprites(object):
+    """
+    A class to draw each asteroid and bullet on screen with a GObject of its own.
+
+    This is how the wave is drawn when BATCH_DRAW is off. The bodies hold no graphics,
+    so this class keeps a pool of GImages for each asteroid image and a pool of
+    GEllipses for the bullets. Each frame it moves one GObject from the pool onto each
+    body on screen, and draws it. A pool only grows when more bodies of its kind are on
+    screen at once than ever before, so bodies off screen never get a GObject.
+    """
+    # Attribute _images: the GImages for the asteroids
+    # Invariant: _images is a dict from image name to a list of GImage with that image
+    #
+    # Attribute _ellipses: the GEllipses for the bullets
+    # Invariant: _ellipses is a list of GEllipse
+
+    def __init__(self):
+        """
+        Initializes the sprites with empty pools.
+        """
+        self._images = {LARGE_IMAGE: [], MEDIUM_IMAGE: [], SMALL_IMAGE: []}
+        self._ellipses = []
+
+    def draw(self, view, asteroids, bullets):
+        """
+        Draws the asteroids and bullets to view.
+
+        Parameter view: The game view
+        Precondition: view is a GView
+
+        Parameter asteroids: The asteroids to draw
+        Precondition: asteroids is a list of Asteroid
+
+        Parameter bullets: The bullets to draw
+        Precondition: bullets is a list of Bullet
+        """
+        used = {LARGE_IMAGE: 0, MEDIUM_IMAGE: 0, SMALL_IMAGE: 0}
+        for asteroid in asteroids:
+            if _onscreen(asteroid.x, asteroid.y, asteroid.width/2):
+                pool = self._images[asteroid.source]
+                i = used[asteroid.source]
+                if i == len(pool):
+                    pool.append(GImage(x=asteroid.x, y=asteroid.y, width=asteroid.width,
+                                       height=asteroid.height, source=asteroid.source))
+                sprite = pool[i]
+                sprite.x = asteroid.x
+                sprite.y = asteroid.y
+                sprite.draw(view)
+                used[asteroid.source] = i+1
+
+        i = 0
+        for bullet in bullets:
+            if _onscreen(bullet.x, bullet.y, BULLET_RADIUS):
+                if i == len(self._ellipses):
+                    self._ellipses.append(GEllipse(x=bullet.x, y=bullet.y,
+                                                   width=BULLET_RADIUS*2,
+                                                   height=BULLET_RADIUS*2,
+                                                   fillcolor=BULLET_COLOR))
+                sprite = self._ellipses[i]
+                sprite.x = bullet.x
+                sprite.y = bullet.y
+                sprite.draw(view)
+                i += 1
+
+
+def _onscreen(x, y, r):
+    """
+    Returns True if a body of radius r centered at (x, y) can be seen.
+
+    Parameter x: The horizontal coordinate of the body center
+    Precondition: x is an int or float
+
+    Parameter y: The vertical coordinate of the body center
+    Precondition: y is an int or float
+
+    Parameter r: The body radius
+    Precondition: r is a number >= 0
+    """
+    return -r < x < GAME_WIDTH+r and -r < y < GAME_HEIGHT+r
+
+
+class _MeshBuffer(object):
+    """
+    Kivy meshes of copies of one shape, with the vertex lists they are drawn from.
+
+    A shape is a list of vertices (x, y, u, v), with x and y relative to the center
+    and scaled by the half width and half height of each copy, and the indices of its
+    triangles. Copies are added between start and finish.
+
+    Kivy indexes a mesh with 16 bit ints, so a mesh can hold at most MESH_VERTICES
+    vertices. Once a mesh is full, the next copies go in a new mesh (added to group),
+    so any number of copies can be drawn.
+    """
+    # Attribute group: the instructions drawing all the meshes
+    # Invariant: group is a Kivy InstructionGroup
+    #
+    # Attribute _texture: the texture of every mesh
+    # Invariant: _texture is a Kivy Texture, or None for a plain color
+    #
+    # Attribute _shape: the vertices of the shape
+    # Invariant: _shape is a list of (x, y, u, v) tuples
+    #
+    # Attribute _indices: the indices of the triangles of the shape
+    # Invariant: _indices is a list of ints < len(_shape)
+    #
+    # Attribute _limit: the most copies a mesh can hold
+    # Invariant: _limit is MESH_VERTICES // len(_shape)
+    #
+    # Attribute _meshes: the meshes drawn, in group
+    # Invariant: _meshes is a list of Kivy Mesh in triangle mode
+    #
+    # Attribute _vertices: the vertices of every copy added to each mesh (and stale
+    #                      ones after)
+    # Invariant: _vertices is a list of lists of floats, 4 per vertex, one list for
+    #            each mesh in _meshes
+    #
+    # Attribute _count: the number of copies added since start
+    # Invariant: _count is an int >= 0 and <= _limit*len(_meshes)
+    #
+    # Attribute _drawn: the number of copies in the indices of each mesh
+    # Invariant: _drawn is a list of ints in 0.._limit, one for each mesh in _meshes
+
+    def __init__(self, texture, shape):
+        """
+        Initializes an empty mesh of copies of shape.
+
+        Parameter texture: The texture of the mesh
+        Precondition: texture is a Kivy Texture, or None for a plain color
+
+        Parameter shape: The vertices and triangle indices of the shape
+        Precondition: shape is a pair (vertices, indices) as described above
+        """
+        from kivy.graphics import InstructionGroup
+        self.group = InstructionGroup()
+        self._texture = texture
+        self._shape = shape[0]
+        self._indices = shape[1]
+        self._limit = MESH_VERTICES // len(self._shape)
+        self._meshes = []
+        self._vertices = []
+        self._count = 0
+        self._drawn = []
+        self._grow()
+
+    def start(self):
+        """
+        Removes every copy, to add them again.
+        """
+        self._count = 0
+
+    def add(self, x, y, hw, hh):
+        """
+        Adds a copy of the shape centered at (x, y), scaled by (hw, hh).
+
+        The vertex lists only grow when there are more copies than ever before.
+        """
+        m, k = divmod(self._count, self._limit)
+        if m == len(self._meshes):
+            self._grow()
+        vertices = self._vertices[m]
+        i = k*len(self._shape)*4
+        if i == len(vertices):
+            vertices.extend([0.0]*(len(self._shape)*4))
+        for sx, sy, u, v in self._shape:
+            vertices[i] = x + sx*hw
+            vertices[i+1] = y + sy*hh
+            vertices[i+2] = u
+            vertices[i+3] = v
+            i += 4
+        self._count += 1
+
+    def finish(self):
+        """
+        Sends the copies added since start to the meshes.
+        """
+        n = len(self._shape)
+        for m in range(len(self._meshes)):
+            count = min(max(self._count - m*self._limit, 0), self._limit)
+            if count == 0 and self._drawn[m] == 0:
+                continue
+            self._meshes[m].vertices = self._vertices[m]
+            if self._drawn[m] != count:
+                self._meshes[m].indices = [k*n + j for k in range(count)
+                                           for j in self._indices]
+                self._drawn[m] = count
+
+    def _grow(self):
+        """
+        Adds an empty mesh after the others.
+        """
+        from kivy.graphics import Mesh
+        mesh = Mesh(mode='triangles', texture=self._texture)
+        self._meshes.append(mesh)
+        self._vertices.append([])
+        self._drawn.append(0)
+        self.group.add(mesh)
+
+
+def _disk():
+    """
+    Returns the shape of a disk of radius 1, as a fan of BULLET_SEGMENTS triangles.
+    """
+    shape = [(0.0, 0.0, 0.5, 0.5)]
+    indices = []
+    for k in range(BULLET_SEGMENTS):
+        a = 2*math.pi*k/BULLET_SEGMENTS
+        shape.append((math.cos(a), math.sin(a), 0.5, 0.5))
+        indices.extend([0, k+1, (k+1) % BULLET_SEGMENTS + 1])
+    return (shape, indices)
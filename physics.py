@@ -0,0 +1,260 @@
+"""
+Vectorized physics module for Planetoids
+
+This module contains an optional physics backend that keeps the positions and
+velocities of the asteroids (or the bullets) of a wave in NumPy arrays, one array per
+component. Moving and wrapping the whole field is then a handful of array operations
+instead of a method call per object.
+
+The arrays are the authority on where the bodies are. The model objects only get
+their x and y copied back from the arrays when Wave needs to look at them, which is
+right before they are drawn (or tested for collisions when nothing is drawn). The
+arrays also keep the positions from before the last step, so that the copy made for
+drawing can be placed between two physics ticks. Row i of the arrays always belongs to
+element i of the matching list in Wave, so Wave must add and remove bodies through
+this class as well.
+
+NumPy is optional. If it is not installed, available() returns False and Wave falls
+back to moving each object on its own. It is not imported until it is needed.
+"""
+from consts import *
+
+# The numpy module, imported the first time available() is called
+numpy = None
+# Whether the import of numpy was tried
+_imported = False
+
+
+def available():
+    """
+    Returns True if the NumPy backend can be used.
+
+    NumPy takes a noticeable part of startup to import, so it is only imported here,
+    the first time a wave asks for the backend.
+    """
+    global numpy, _imported
+    if not _imported:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _imported = True
+    return numpy is not None
+
+
+class BodyArrays(object):
+    """
+    A class holding the positions and velocities of a list of bodies as arrays.
+
+    Each component (x, y, previous x, previous y, velocity x, velocity y, age in
+    frames) is its own contiguous array. Only the first len(self) entries of each array
+    are in use; the arrays grow by doubling when they run out of room.
+    """
+    # Attribute _size: the number of bodies
+    # Invariant: _size is an int >= 0 and <= the length of each array
+    #
+    # Attribute _x, _y: the body positions
+    # Invariant: _x and _y are float64 arrays of the same length
+    #
+    # Attribute _px, _py: the body positions before the last step (after wrapping)
+    # Invariant: _px and _py are float64 arrays of the same length as _x
+    #
+    # Attribute _vx, _vy: the body velocities
+    # Invariant: _vx and _vy are float64 arrays of the same length as _x
+    #
+    # Attribute _age: the number of times each body has moved
+    # Invariant: _age is an int32 array of the same length as _x
+    #
+    # Attribute _synced: how far between ticks the bodies were placed by the last sync
+    # Invariant: _synced is a float in 0..1, or None if the bodies have moved since
+
+    def __init__(self, capacity=64):
+        """
+        Initializes an empty set of arrays.
+
+        Parameter capacity: The number of bodies to make room for
+        Precondition: capacity is an int > 0
+        """
+        assert available(), 'the NumPy backend needs numpy'
+        assert isinstance(capacity, int) and capacity > 0
+        self._size = 0
+        self._x = numpy.zeros(capacity)
+        self._y = numpy.zeros(capacity)
+        self._px = numpy.zeros(capacity)
+        self._py = numpy.zeros(capacity)
+        self._vx = numpy.zeros(capacity)
+        self._vy = numpy.zeros(capacity)
+        self._age = numpy.zeros(capacity, dtype=numpy.int32)
+        self._synced = None
+
+    def __len__(self):
+        return self._size
+
+    def append(self, body):
+        """
+        Adds a row for body at the end of the arrays.
+
+        Parameter body: The body to add
+        Precondition: body has attributes x and y and getters getvx() and getvy()
+        """
+        if self._size == len(self._x):
+            self._grow()
+        n = self._size
+        self._x[n] = body.x
+        self._y[n] = body.y
+        self._px[n] = body.x
+        self._py[n] = body.y
+        self._vx[n] = body.getvx()
+        self._vy[n] = body.getvy()
+        self._age[n] = 0
+        self._size = n+1
+
+    def step(self):
+        """
+        Adds the velocity of every body to its position.
+        """
+        n = self._size
+        self._px[:n] = self._x[:n]
+        self._py[:n] = self._y[:n]
+        self._x[:n] += self._vx[:n]
+        self._y[:n] += self._vy[:n]
+        self._age[:n] += 1
+        self._synced = None
+
+    def wrap(self):
+        """
+        Wraps every body that has left the dead zone to the other side of the screen.
+
+        This is the vectorized form of the dead zone helpers in Wave, and it applies the
+        two tests for each axis in the same order that they do. The previous positions
+        are shifted along with the positions, so a wrapped body is not drawn sweeping
+        across the screen.
+        """
+        n = self._size
+        self._wrap_axis(self._x[:n], self._px[:n], GAME_WIDTH)
+        self._wrap_axis(self._y[:n], self._py[:n], GAME_HEIGHT)
+
+    def expired(self):
+        """
+        Returns a boolean array marking the bullets that have expired.
+
+        This is the vectorized form of Bullet.isexpired, for arrays holding bullets.
+        """
+        n = self._size
+        x = self._x[:n]
+        y = self._y[:n]
+        result = self._age[:n] >= BULLET_LIFETIME
+        result |= (x < -BULLET_REACH) | (x > GAME_WIDTH + BULLET_REACH)
+        result |= (y < -BULLET_REACH) | (y > GAME_HEIGHT + BULLET_REACH)
+        return result
+
+    def compact(self, keep):
+        """
+        Removes every row that keep marks as False, preserving the order of the rest.
+
+        Parameter keep: Whether to keep each row
+        Precondition: keep is a sequence of len(self) bools (or a boolean array)
+        """
+        n = self._size
+        keep = numpy.asarray(keep, dtype=bool)
+        assert len(keep) == n
+        k = int(keep.sum())
+        if k == n:
+            return
+        for array in (self._x, self._y, self._px, self._py, self._vx, self._vy, self._age):
+            array[:k] = array[:n][keep]
+        self._size = k
+
+    def sync(self, bodies, alpha=1.0):
+        """
+        Copies the positions in the arrays back to the model objects.
+
+        The objects are placed alpha of the way from their previous positions to their
+        current ones, so alpha 1 (the default) puts them where they really are. Nothing
+        is copied if the objects are already in place.
+
+        Parameter bodies: The bodies matching the rows of the arrays
+        Precondition: bodies is a list of len(self) objects with attributes x and y
+
+        Parameter alpha: How far to place the bodies between the last two ticks
+        Precondition: alpha is a float in 0..1
+        """
+        if self._synced == alpha:
+            return
+        n = self._size
+        if alpha == 1.0:
+            xs = self._x[:n]
+            ys = self._y[:n]
+        else:
+            xs = self._px[:n] + (self._x[:n] - self._px[:n])*alpha
+            ys = self._py[:n] + (self._y[:n] - self._py[:n])*alpha
+        for body, x, y in zip(bodies, xs.tolist(), ys.tolist()):
+            body.x = x
+            body.y = y
+        self._synced = alpha
+
+    def tobytes(self):
+        """
+        Returns the rows in use as bytes, one column after another.
+
+        The columns are x, y, previous x, previous y, velocity x and velocity y (as
+        float64) and then age (as int32), each len(self) long, in the byte order of the
+        machine. This is the layout of Wave.snapshot.
+        """
+        n = self._size
+        data = [array[:n].tobytes() for array in (self._x, self._y, self._px, self._py,
+                                                  self._vx, self._vy, self._age)]
+        return b''.join(data)
+
+    def frombytes(self, data, size):
+        """
+        Replaces every row with the size rows in data, as laid out by tobytes.
+
+        Parameter data: The rows
+        Precondition: data is a bytes-like object of length 52*size
+
+        Parameter size: The number of rows
+        Precondition: size is an int >= 0
+        """
+        while len(self._x) < size:
+            self._grow()
+        columns = numpy.frombuffer(data, dtype=numpy.float64, count=6*size)
+        for k, array in enumerate((self._x, self._y, self._px, self._py, self._vx, self._vy)):
+            array[:size] = columns[k*size:(k+1)*size]
+        self._age[:size] = numpy.frombuffer(data, dtype=numpy.int32, count=size,
+                                            offset=48*size)
+        self._size = size
+        self._synced = None
+
+    def _wrap_axis(self, pos, prev, size):
+        """
+        Wraps one axis of positions (and the matching previous positions) in place.
+
+        Parameter pos: The positions on this axis
+        Precondition: pos is a float64 array
+
+        Parameter prev: The previous positions on this axis
+        Precondition: prev is a float64 array of the same length as pos
+
+        Parameter size: The size of the screen on this axis
+        Precondition: size is GAME_WIDTH or GAME_HEIGHT
+        """
+        low = pos < -DEAD_ZONE
+        pos[low] += size + (2*DEAD_ZONE)
+        prev[low] += size + (2*DEAD_ZONE)
+        high = pos > size + DEAD_ZONE
+        pos[high] -= size + (2*DEAD_ZONE)
+        prev[high] -= size + (2*DEAD_ZONE)
+
+    def _grow(self):
+        """
+        Doubles the room in each array.
+        """
+        self._x = numpy.concatenate((self._x, numpy.zeros(len(self._x))))
+        self._y = numpy.concatenate((self._y, numpy.zeros(len(self._y))))
+        self._px = numpy.concatenate((self._px, numpy.zeros(len(self._px))))
+        self._py = numpy.concatenate((self._py, numpy.zeros(len(self._py))))
+        self._vx = numpy.concatenate((self._vx, numpy.zeros(len(self._vx))))
+        self._vy = numpy.concatenate((self._vy, numpy.zeros(len(self._vy))))
+        self._age = numpy.concatenate((self._age, numpy.zeros(len(self._age),
+                                                              dtype=numpy.int32)))
@@ -0,0 +1,203 @@
+"""
+Frame profiler module for Planetoids
+
+This module times where each frame goes. A Profiler splits every frame into named
+phases (spawning asteroids, reading input, moving the ship, firing, collisions,
+moving the asteroids and the bullets, drawing) and keeps a rolling window of the
+last PROFILE_WINDOW frames, with the time of each phase, the number of objects on
+screen, and the net number of memory blocks allocated during the frame. From that
+window it reports the p50, p95 and p99 of every phase, as text for the overlay or as
+a CSV or JSON trace.
+
+Instrumented code holds the profiler in an attribute that is None when profiling is
+off, and checks it before each call, so that turning profiling off costs one test per
+phase:
+
+    prof = self._profiler
+    if prof is not None:
+        prof.start()
+    ...                      # read the input
+    if prof is not None:
+        prof.lap('input')
+
+This module does not use game2d. Drawing the overlay is up to the application.
+"""
+from consts import *
+from collections import deque
+import json
+import sys
+import time
+
+
+class Profiler(object):
+    """
+    A class that records per-phase frame times over a rolling window.
+
+    Each call to frame ends the frame in progress (adding it to the window) and starts
+    a new one. Within a frame, start marks the beginning of a run of phases and each
+    lap(name) charges the time since the last mark to the phase name. A phase timed
+    more than once in a frame (e.g. once per physics tick) adds up.
+    """
+    # Attribute _window: the finished frames, oldest first
+    # Invariant: _window is a deque of dicts with at most PROFILE_WINDOW elements. Each
+    #            dict maps 'frame' to the frame number, each phase to its time in
+    #            milliseconds, each counted object to its count, and 'allocs' to the
+    #            net number of memory blocks allocated in the frame.
+    #
+    # Attribute _phases: the names of all phases seen, in order
+    # Invariant: _phases is a list of strings
+    #
+    # Attribute _counts: the names of all counted objects seen, in order
+    # Invariant: _counts is a list of strings
+    #
+    # Attribute _current: the frame in progress
+    # Invariant: _current is a dict like the ones in _window, or None before the first
+    #            call to frame
+    #
+    # Attribute _frames: the number of frames started
+    # Invariant: _frames is an int >= 0
+    #
+    # Attribute _start: the time the frame in progress started, from time.perf_counter
+    # Invariant: _start is a float
+    #
+    # Attribute _last: the time of the last mark, from time.perf_counter
+    # Invariant: _last is a float
+    #
+    # Attribute _blocks: the allocated memory blocks at the start of the frame
+    # Invariant: _blocks is an int >= 0
+
+    def __init__(self, window=PROFILE_WINDOW):
+        """
+        Initializes an empty profiler.
+
+        Parameter window: The number of frames to keep
+        Precondition: window is an int > 0
+        """
+        assert isinstance(window, int) and window > 0
+        self._window = deque(maxlen=window)
+        self._phases = []
+        self._counts = []
+        self._current = None
+        self._frames = 0
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._blocks = sys.getallocatedblocks()
+
+    # RECORDING
+    def frame(self):
+        """
+        Ends the frame in progress and starts a new one.
+        """
+        now = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        if self._current is not None:
+            self._current['total'] = (now - self._start)*1000
+            self._current['allocs'] = blocks - self._blocks
+            self._window.append(self._current)
+        self._frames += 1
+        self._current = {'frame': self._frames}
+        self._start = now
+        self._last = now
+        self._blocks = blocks
+
+    def start(self):
+        """
+        Marks the start of the next phase.
+        """
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Charges the time since the last mark to phase, and marks the time.
+
+        Parameter phase: The phase name
+        Precondition: phase is a string
+        """
+        now = time.perf_counter()
+        self._add(phase, (now - self._last)*1000)
+        self._last = now
+
+    def count(self, name, value):
+        """
+        Records the number of objects called name in this frame.
+
+        Parameter name: The name of the objects (e.g. 'num_asteroids')
+        Precondition: name is a string
+
+        Parameter value: The number of objects
+        Precondition: value is an int >= 0
+        """
+        if self._current is not None:
+            if not name in self._counts:
+                self._counts.append(name)
+            self._current[name] = value
+
+    # REPORTING
+    def getframes(self):
+        return self._frames
+
+    def percentiles(self, phase):
+        """
+        Returns the (p50, p95, p99) of phase over the window, or None if never recorded.
+
+        Phases are in milliseconds. A frame in which a phase did not run counts as 0.
+
+        Parameter phase: The phase (or count) name, or 'total' or 'allocs'
+        Precondition: phase is a string
+        """
+        values = sorted(row.get(phase, 0) for row in self._window)
+        if len(values) == 0:
+            return None
+        last = len(values)-1
+        return (values[last*50//100], values[last*95//100], values[last*99//100])
+
+    def summary(self):
+        """
+        Returns a text summary of the window, one line per phase, count and allocs.
+        """
+        lines = ['%-14s %7s %7s %7s' % ('', 'p50', 'p95', 'p99')]
+        for name in ['total'] + self._phases:
+            stats = self.percentiles(name)
+            if stats is not None:
+                lines.append('%-14s %7.2f %7.2f %7.2f' % ((name+' ms',) + stats))
+        for name in self._counts + ['allocs']:
+            stats = self.percentiles(name)
+            if stats is not None:
+                lines.append('%-14s %7d %7d %7d' % ((name,) + stats))
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        """
+        Writes the frames in the window to the file path.
+
+        The trace is written as CSV (one row per frame) if path ends in .csv, and as
+        JSON (a list with one object per frame) otherwise.
+
+        Parameter path: The file to write
+        Precondition: path is a string
+        """
+        assert isinstance(path, str)
+        columns = ['frame', 'total'] + self._phases + self._counts + ['allocs']
+        with open(path, 'w') as file:
+            if path.lower().endswith('.csv'):
+                file.write(','.join(columns)+'\n')
+                for row in self._window:
+                    file.write(','.join(str(row.get(name, 0)) for name in columns)+'\n')
+            else:
+                json.dump(list(self._window), file)
+
+    # HELPER METHODS
+    def _add(self, phase, value):
+        """
+        Adds value to the time of phase in the frame in progress.
+
+        Parameter phase: The phase name
+        Precondition: phase is a string
+
+        Parameter value: The time to add, in milliseconds
+        Precondition: value is a float
+        """
+        if self._current is not None:
+            if not phase in self._phases:
+                self._phases.append(phase)
+            self._current[phase] = self._current.get(phase, 0) + value
@@ -0,0 +1,215 @@
+"""
+Input recording module for Planetoids
+
+This module records the keys the player holds down each frame, so that a session can
+be replayed exactly, frame for frame. Since the wave runs at a fixed tick rate (see
+app.py), a frame is recorded as the keys down in REPLAY_KEYS (one bit each) together
+with the number of wave ticks run in it. Replaying the same ticks with the same keys,
+from the same wave and random seed, plays the session again exactly, however fast the
+replaying machine is. This is what makes it possible to profile a slowdown a player
+reported on the frames where it happened.
+
+A recording is a small binary file: a header with the seed, the lives and asteroids
+destroyed at the start of the wave (a campaign carries them over from the wave before,
+see campaign.py), and the wave file, then two bytes per frame (the key bits and the
+ticks). An hour at 60 frames per second is about 430 KB.
+
+A Recorder records frames and saves them; a ReplayInput loads a recording and stands
+in for GInput (like headless.ScriptedInput), so it can be given to Planetoids or
+directly to Wave.update.
+"""
+from consts import *
+from array import array
+import struct
+
+# The first bytes of every recording
+MAGIC = b'PREC'
+# The version of the recording format
+VERSION = 2
+# The header: magic, version, seed, lives, destroyed, and the length of the wave file
+# name
+_HEADER = struct.Struct('<4sHIIIH')
+
+
+class Recorder(object):
+    """
+    A class to record the input of a wave, frame by frame.
+
+    Call record once per frame with the input and the ticks run, then save.
+    """
+    # Attribute _seed: the random seed of the wave
+    # Invariant: _seed is an int >= 0 and < 2**32
+    #
+    # Attribute _wave: the wave file played
+    # Invariant: _wave is a string
+    #
+    # Attribute _lives: the lives left at the start of the wave
+    # Invariant: _lives is an int >= 0 and < 2**32
+    #
+    # Attribute _destroyed: the asteroids destroyed at the start of the wave
+    # Invariant: _destroyed is an int >= 0 and < 2**32
+    #
+    # Attribute _frames: the key bits and ticks of each frame, interleaved
+    # Invariant: _frames is an array('B') of even length
+
+    def getframes(self):
+        return len(self._frames)//2
+
+    def __init__(self, seed, wave, lives, destroyed):
+        """
+        Initializes an empty recording.
+
+        Parameter seed: The random seed of the wave
+        Precondition: seed is an int >= 0 and < 2**32
+
+        Parameter wave: The wave file played
+        Precondition: wave is a string
+
+        Parameter lives: The lives left at the start of the wave
+        Precondition: lives is an int >= 0 and < 2**32
+
+        Parameter destroyed: The asteroids destroyed at the start of the wave
+        Precondition: destroyed is an int >= 0 and < 2**32
+        """
+        assert isinstance(seed, int) and 0 <= seed < 2**32
+        assert isinstance(wave, str)
+        assert isinstance(lives, int) and 0 <= lives < 2**32
+        assert isinstance(destroyed, int) and 0 <= destroyed < 2**32
+        self._seed = seed
+        self._wave = wave
+        self._lives = lives
+        self._destroyed = destroyed
+        self._frames = array('B')
+
+    def record(self, input, ticks):
+        """
+        Records the keys down in input for this frame, and the ticks run.
+
+        Parameter input: The player input
+        Precondition: input is a GInput (or any object with the method is_key_down)
+
+        Parameter ticks: The wave ticks run this frame
+        Precondition: ticks is an int >= 0 and < 256
+        """
+        bits = 0
+        for i in range(len(REPLAY_KEYS)):
+            if input.is_key_down(REPLAY_KEYS[i]):
+                bits |= 1 << i
+        self._frames.append(bits)
+        self._frames.append(ticks)
+
+    def save(self, path):
+        """
+        Writes the recording to the file path.
+
+        Parameter path: The file to write
+        Precondition: path is a string
+        """
+        name = self._wave.encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, self._seed, self._lives,
+                                    self._destroyed, len(name)))
+            file.write(name)
+            self._frames.tofile(file)
+
+
+class ReplayInput(object):
+    """
+    A class that replaces GInput with a recording.
+
+    Like GInput, the keys are read with is_key_down. Unlike GInput, time only passes
+    when advance is called, which should happen once per frame. Once the recording
+    runs out, no keys are down and no ticks are run.
+    """
+    # Attribute _seed: the random seed of the recorded wave
+    # Invariant: _seed is an int >= 0 and < 2**32
+    #
+    # Attribute _wave: the recorded wave file
+    # Invariant: _wave is a string
+    #
+    # Attribute _lives: the lives left at the start of the recorded wave
+    # Invariant: _lives is an int >= 0
+    #
+    # Attribute _destroyed: the asteroids destroyed at the start of the recorded wave
+    # Invariant: _destroyed is an int >= 0
+    #
+    # Attribute _frames: the key bits and ticks of each frame, interleaved
+    # Invariant: _frames is an array('B') of even length
+    #
+    # Attribute _frame: the current frame
+    # Invariant: _frame is an int >= 0
+
+    def getseed(self):
+        return self._seed
+
+    def getwave(self):
+        return self._wave
+
+    def getlives(self):
+        return self._lives
+
+    def getdestroyed(self):
+        return self._destroyed
+
+    def getframes(self):
+        return len(self._frames)//2
+
+    def getframe(self):
+        return self._frame
+
+    def __init__(self, path):
+        """
+        Initializes the input at the start of the recording in the file path.
+
+        Parameter path: The recording file
+        Precondition: path is a string naming a file written by Recorder.save. If the
+        file is not a recording, this raises a ValueError.
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < _HEADER.size:
+            raise ValueError('%s is not a recording' % repr(path))
+        magic, version, seed, lives, destroyed, size = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d recording' % (repr(path), VERSION))
+        start = _HEADER.size + size
+        self._seed = seed
+        self._lives = lives
+        self._destroyed = destroyed
+        self._wave = data[_HEADER.size:start].decode('utf-8')
+        self._frames = array('B', data[start:start + (len(data)-start)//2*2])
+        self._frame = 0
+
+    def isdone(self):
+        """
+        Returns True if the recording has run out.
+        """
+        return self._frame >= len(self._frames)//2
+
+    def getticks(self):
+        """
+        Returns the wave ticks run this frame.
+        """
+        if self.isdone():
+            return 0
+        return self._frames[2*self._frame+1]
+
+    def is_key_down(self, key):
+        """
+        Returns True if key is held down this frame.
+
+        Keys that are not in REPLAY_KEYS are never down.
+
+        Parameter key: The key to check
+        Precondition: key is a string
+        """
+        if self.isdone() or not key in REPLAY_KEYS:
+            return False
+        return self._frames[2*self._frame] & (1 << REPLAY_KEYS.index(key)) != 0
+
+    def advance(self):
+        """
+        Moves the recording forward one frame.
+        """
+        if not self.isdone():
+            self._frame += 1
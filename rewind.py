@@ -0,0 +1,241 @@
+"""
+Rewind module for Planetoids
+
+This module lets a wave be stepped back in time, a tick at a time, within a fixed
+memory budget.
+
+Storing the whole wave every tick would take far too much memory over a session. But
+a wave is deterministic: given its state at one tick and the keys held down for each
+tick after, it plays out exactly the same (see replay.py). So the history is stored as
+segments, each a keyframe (a Wave.snapshot) followed by one byte per tick, holding the
+keys down in that tick (as in a recording) and whether the ship was respawned before
+it. The positions, and the asteroids and bullets spawned or destroyed in those ticks,
+are not stored; they are worked out again from the keyframe when they are needed.
+
+Stepping back to a tick restores the keyframe before it and plays the segment forward
+to that tick, keeping a snapshot of every tick on the way. Further steps back in the
+same segment just restore one of those, so rewinding a tick at a time costs about one
+update per tick.
+
+The first step back into a segment is the slow one, as it plays the whole segment
+again. Both a tick and a snapshot take time in proportion to the size of the wave, so
+a segment is cut short once its ticks would make more than REWIND_REPLAY_BYTES of
+snapshots when played again (but is never longer than REWIND_KEYFRAME ticks). A big
+wave thus has keyframes more often, which keeps that step short however big the wave
+is, at the cost of a shorter history.
+
+When the history is over REWIND_BYTES, the oldest segments are dropped. The snapshots
+kept while stepping back count toward it too. Stepping back drops the ticks after the
+one stepped back to; playing on from there makes new ones.
+"""
+from consts import *
+from collections import deque
+
+# The bit in a tick byte for a ship respawned before the tick (the keys use the bits
+# below it, in the order of REPLAY_KEYS)
+RESPAWN_BIT = 1 << len(REPLAY_KEYS)
+assert RESPAWN_BIT < 256, 'too many keys for a tick byte'
+
+
+class Rewind(object):
+    """
+    A class to record the history of a wave and step it back.
+
+    Once made, the wave should only be updated through Rewind.update.
+    """
+    # Attribute _wave: the wave recorded
+    # Invariant: _wave is a Wave
+    #
+    # Attribute _segments: the history, oldest first
+    # Invariant: _segments is a deque of [start, keyframe, ticks] lists, where start is
+    #            the tick of the keyframe, keyframe is the snapshot before that tick,
+    #            and ticks is a bytearray of at most _length(keyframe) tick bytes.
+    #            Each segment starts where the one before ends.
+    #
+    # Attribute _tick: the number of ticks the wave has run
+    # Invariant: _tick is an int >= 0, the end of the last segment (if any)
+    #
+    # Attribute _bytes: the memory used by the history
+    # Invariant: _bytes is the total length of the keyframes and ticks in _segments,
+    #            and of the snapshots in _cache (but the first, the keyframe)
+    #
+    # Attribute _shipless: whether the wave had no ship after the last tick
+    # Invariant: _shipless is a bool
+    #
+    # Attribute _cache: the snapshots of the segment being stepped back through
+    # Invariant: _cache is a pair (start, snapshots), with snapshots[k] the snapshot
+    #            before tick start+k, or None if not stepping back
+
+    def getticks(self):
+        """
+        Returns the number of ticks the wave can be stepped back.
+        """
+        if len(self._segments) == 0:
+            return 0
+        return self._tick - self._segments[0][0]
+
+    def getbytes(self):
+        return self._bytes
+
+    def __init__(self, wave):
+        """
+        Initializes an empty history of wave, starting now.
+
+        Parameter wave: The wave to record
+        Precondition: wave is a Wave
+        """
+        self._wave = wave
+        self._segments = deque()
+        self._tick = 0
+        self._bytes = 0
+        self._shipless = wave.getship() is None
+        self._cache = None
+
+    def update(self, input, dt):
+        """
+        Records the tick and then updates the wave with input.
+
+        Parameter input: The player input
+        Precondition: input is a GInput (or any object with the method is_key_down)
+
+        Parameter dt: The length of the tick in seconds
+        Precondition: dt is TICK_TIME
+        """
+        self._uncache(0)
+        bits = 0
+        for i in range(len(REPLAY_KEYS)):
+            if input.is_key_down(REPLAY_KEYS[i]):
+                bits |= 1 << i
+        if self._shipless and self._wave.getship() is not None:
+            bits |= RESPAWN_BIT
+
+        if (len(self._segments) == 0 or
+            len(self._segments[-1][2]) == _length(self._segments[-1][1])):
+            keyframe = self._wave.snapshot()
+            self._segments.append([self._tick, keyframe, bytearray()])
+            self._bytes += len(keyframe)
+            self._trim()
+        self._segments[-1][2].append(bits)
+        self._bytes += 1
+        self._tick += 1
+
+        self._wave.update(input, dt)
+        self._shipless = self._wave.getship() is None
+
+    def back(self, ticks=1):
+        """
+        Steps the wave back the given number of ticks.
+
+        The wave is put back as it was right before the tick, so if the ship was
+        respawned then, it is there.
+
+        If the history does not go back that far, the wave is stepped back as far as
+        it can be. This returns the number of ticks actually stepped back.
+
+        Parameter ticks: The number of ticks to step back
+        Precondition: ticks is an int >= 0
+        """
+        assert isinstance(ticks, int) and ticks >= 0
+        ticks = min(ticks, self.getticks())
+        if ticks == 0:
+            return 0
+        target = self._tick - ticks
+        while self._segments[-1][0] > target:
+            start, keyframe, past = self._segments.pop()
+            self._bytes -= len(keyframe) + len(past)
+        start, keyframe, past = self._segments[-1]
+
+        if self._cache is None or self._cache[0] != start:
+            self._uncache(0)
+            self._wave.restore(keyframe)
+            snapshots = [keyframe]
+            for k in range(target - start):
+                self._play(past[k])
+                snapshots.append(self._wave.snapshot())
+                self._bytes += len(snapshots[-1])
+            self._cache = (start, snapshots)
+        else:
+            self._wave.restore(self._cache[1][target - start])
+        self._uncache(target - start + 1)
+        if past[target - start] & RESPAWN_BIT and self._wave.getship() is None:
+            self._wave.create_ship(self._wave.getdata())
+        if target == start:
+            self._uncache(0)
+            self._segments.pop()
+            self._bytes -= len(keyframe) + len(past)
+        else:
+            self._bytes -= len(past) - (target - start)
+            del past[target - start:]
+
+        self._wave.popevents()  # What was replayed already happened
+        self._tick = target
+        self._shipless = self._wave.getship() is None
+        self._trim()
+        return ticks
+
+    # HELPER METHODS
+    def _trim(self):
+        """
+        Drops the oldest segments until the history is within REWIND_BYTES.
+
+        The last segment is never dropped, even if it alone is over.
+        """
+        while self._bytes > REWIND_BYTES and len(self._segments) > 1:
+            start, keyframe, ticks = self._segments.popleft()
+            self._bytes -= len(keyframe) + len(ticks)
+
+    def _uncache(self, count):
+        """
+        Drops the snapshots in _cache after the first count, or all of _cache if count
+        is 0.
+
+        Parameter count: The number of snapshots to keep
+        Precondition: count is an int >= 0
+        """
+        if self._cache is None:
+            return
+        snapshots = self._cache[1]
+        for k in range(max(count, 1), len(snapshots)):
+            self._bytes -= len(snapshots[k])
+        if count == 0:
+            self._cache = None
+        else:
+            del snapshots[count:]
+
+    def _play(self, bits):
+        """
+        Plays one recorded tick of the wave again.
+
+        Parameter bits: The tick byte
+        Precondition: bits is an int in 0..255
+        """
+        if bits & RESPAWN_BIT and self._wave.getship() is None:
+            self._wave.create_ship(self._wave.getdata())
+        self._wave.update(_Keys(bits), TICK_TIME)
+
+
+def _length(keyframe):
+    """
+    Returns the most ticks a segment starting with keyframe may hold.
+
+    This is how many snapshots of about the size of keyframe fit in
+    REWIND_REPLAY_BYTES, but at least 1 and at most REWIND_KEYFRAME.
+
+    Parameter keyframe: The keyframe of the segment
+    Precondition: keyframe is a Wave.snapshot
+    """
+    return max(1, min(REWIND_KEYFRAME, REWIND_REPLAY_BYTES // len(keyframe)))
+
+
+class _Keys(object):
+    """
+    A class standing in for GInput with the keys of a tick byte.
+    """
+    # Attribute _bits: the tick byte
+    # Invariant: _bits is an int in 0..255
+
+    def __init__(self, bits):
+        self._bits = bits
+
+    def is_key_down(self, key):
+        return key in REPLAY_KEYS and self._bits & (1 << REPLAY_KEYS.index(key)) != 0
@@ -0,0 +1,87 @@
+"""
+Sound module for Planetoids
+
+This module plays the sounds of the game. The wave reports what happened in each
+update as events (see Wave.popevents), and the application hands them to a SoundBank,
+which plays the sound of each event as set in SOUNDS.
+
+Every sound is loaded when the bank is made (once, in Planetoids.start), so playing
+one never touches the filesystem. Each sound has a fixed number of voices, which are
+copies of it that take turns playing, so no more than that many play at once. A sound
+also does not play again until enough time has passed since the last time, so a burst
+of events does not become a burst of audio.
+
+This module uses game2d, so only app.py may import it.
+"""
+from consts import *
+from game2d import *
+
+
+class SoundBank(object):
+    """
+    A class to play the sounds of events, with a limit on voices and on how often.
+    """
+    # Attribute _voices: the loaded copies of the sound of each event
+    # Invariant: _voices is a dict from event name to a nonempty list of Sound
+    #
+    # Attribute _next: the voice of each event to play next
+    # Invariant: _next is a dict from event name to an index in _voices[name]
+    #
+    # Attribute _interval: the least time between plays of the sound of each event
+    # Invariant: _interval is a dict from event name to a number of seconds >= 0
+    #
+    # Attribute _last: when the sound of each event was last played
+    # Invariant: _last is a dict from event name to a time (see _time), or None if
+    #            it was never played
+    #
+    # Attribute _time: the time in seconds since the bank was made
+    # Invariant: _time is a float >= 0
+
+    def __init__(self, sounds=SOUNDS):
+        """
+        Initializes the bank, loading every voice of every sound.
+
+        Parameter sounds: The sound of each event
+        Precondition: sounds is a dict from event name to a (sound file, voices,
+        seconds between plays) triple, where voices is an int > 0
+        """
+        self._voices = {}
+        self._next = {}
+        self._interval = {}
+        self._last = {}
+        for name in sounds:
+            source, voices, interval = sounds[name]
+            assert isinstance(voices, int) and voices > 0, repr(sounds[name])
+            self._voices[name] = [Sound(source) for i in range(voices)]
+            self._next[name] = 0
+            self._interval[name] = interval
+            self._last[name] = None
+        self._time = 0.0
+
+    def update(self, dt):
+        """
+        Moves the clock of the bank forward.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        self._time += dt
+
+    def play(self, events):
+        """
+        Plays the sound of each event in events, within the limits.
+
+        The sound of an event is skipped if it played less than its interval ago. If
+        every voice of a sound is busy, the one that started first is restarted.
+
+        Parameter events: The events to play
+        Precondition: events is a list of event names
+        """
+        for name in events:
+            if name in self._voices:
+                last = self._last[name]
+                if last is None or self._time - last >= self._interval[name]:
+                    voices = self._voices[name]
+                    voices[self._next[name]].play()
+                    self._next[name] = (self._next[name] + 1) % len(voices)
+                    self._last[name] = self._time
@@ -0,0 +1,67 @@
+"""
+Startup timing module for Planetoids
+
+This module measures how long the game takes to start. It records the time of each
+step of startup (see mark) relative to when this module was first imported, which
+__main__.py does before anything else. The steps are
+
+    imports       the application modules are imported
+    start         Planetoids.start is done (the title screen is ready)
+    first frame   the first frame has been drawn
+    assets        every asset is loaded (see Planetoids._update_assets)
+
+If STARTUP_REPORT is True, the report is printed once the assets are loaded. It can
+also be read at any time with report().
+
+This module must not import anything else from the game, so that it is cheap to import
+first.
+"""
+import time
+
+# The time this module was imported, which startup is measured from
+_START = time.perf_counter()
+
+# The steps marked so far, in order, as (name, seconds since _START) pairs
+_MARKS = []
+
+
+def mark(name):
+    """
+    Records that the step name of startup is done now.
+
+    Only the first mark of each name counts, so it is safe to mark every frame.
+
+    Parameter name: The step name
+    Precondition: name is a string
+    """
+    for step in _MARKS:
+        if step[0] == name:
+            return
+    _MARKS.append((name, time.perf_counter() - _START))
+
+
+def getmark(name):
+    """
+    Returns the seconds from the start to the step name, or None if it is not done.
+
+    Parameter name: The step name
+    Precondition: name is a string
+    """
+    for step in _MARKS:
+        if step[0] == name:
+            return step[1]
+    return None
+
+
+def report():
+    """
+    Returns the times of the steps so far as text, one line per step.
+
+    Each line has the time since the start and since the step before, in milliseconds.
+    """
+    lines = ['%-14s %9s %9s' % ('startup', 'total ms', 'step ms')]
+    last = 0.0
+    for name, seconds in _MARKS:
+        lines.append('%-14s %9.1f %9.1f' % (name, seconds*1000, (seconds-last)*1000))
+        last = seconds
+    return '\n'.join(lines)
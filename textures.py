@@ -0,0 +1,83 @@
+"""
+Texture cache module for Planetoids
+
+This module keeps every image the wave draws loaded for the life of the process, so
+that spawning a ship or an asteroid never touches the filesystem.
+
+game2d loads the image of a GImage through Kivy, which has its own caches of file
+names, images and textures. But Kivy drops anything that has not been used for 60
+seconds, so breaking up the first large asteroid after a quiet minute would load
+asteroid2.png and asteroid3.png from disk again, and make new textures for them.
+preload() loads every image named in consts.py (at every size the game uses) into the
+process-wide cache of this module instead, which holds on to them for good. Kivy's
+own caches are left alone, as other code shares them.
+
+The cache is keyed by image name and size, and holds Kivy textures. It is also where
+any code that draws with Kivy directly should get its textures from.
+
+This module uses Kivy, so only models.py may import it.
+"""
+from consts import *
+
+# The textures loaded so far, keyed by (image name, width, height)
+_TEXTURES = {}
+
+# The images and sizes that the wave draws (see preload)
+_PRELOAD = [(SHIP_IMAGE, SHIP_RADIUS*2, SHIP_RADIUS*2),
+            (LARGE_IMAGE, LARGE_RADIUS*2, LARGE_RADIUS*2),
+            (MEDIUM_IMAGE, MEDIUM_RADIUS*2, MEDIUM_RADIUS*2),
+            (SMALL_IMAGE, SMALL_RADIUS*2, SMALL_RADIUS*2)]
+
+
+def preload():
+    """
+    Loads the ship and every size of asteroid into the cache.
+
+    Only the first call loads anything. Later calls do nothing, so it is cheap to call
+    every time a wave is built.
+    """
+    if len(_TEXTURES) > 0:
+        return
+    for source, width, height in _PRELOAD:
+        get(source, width, height)
+
+
+def get(source, width, height):
+    """
+    Returns the texture for the image source drawn at the given size.
+
+    The image is loaded (and kept) the first time it is asked for.
+
+    Parameter source: The image file name
+    Precondition: source is a string naming a file in the Images folder
+
+    Parameter width: The width the image is drawn at
+    Precondition: width is a number > 0
+
+    Parameter height: The height the image is drawn at
+    Precondition: height is a number > 0
+    """
+    key = (source, width, height)
+    if key not in _TEXTURES:
+        _TEXTURES[key] = _load(source)
+    return _TEXTURES[key]
+
+
+def _load(source):
+    """
+    Returns a newly loaded texture for the image source.
+
+    An image drawn at several sizes shares one texture.
+
+    Parameter source: The image file name
+    Precondition: source is a string naming a file in the Images folder
+    """
+    assert isinstance(source, str)
+    for key in _TEXTURES:
+        if key[0] == source:
+            return _TEXTURES[key]
+    from kivy.core.image import Image
+    from kivy.resources import resource_find
+    path = resource_find(source)
+    assert path is not None, '%s is not in the Images folder' % repr(source)
+    return Image(path).texture
@@ -16,15 +16,39 @@ issue.  If you do not know, ask on Ed Discussions and we will answer.
 # Soul Oyekunle, sgo9
 # December 7, 2022
 """
-from game2d import *
 from consts import *
-from models import *
+import bodies
+import physics
+import profiler
+import wavefile
 import random
 import datetime
+import time
+import struct
+from array import array
 
 # PRIMARY RULE: Wave can only access attributes in models.py via getters/setters
 # Level is NOT allowed to access anything in app.py (Subcontrollers are not permitted
 # to access anything in their parent. To see why, take CS 3152)
+#
+# Wave does not import models.py (and hence game2d) itself. The classes of the ship,
+# asteroids and bullets come from the module in the attribute _models, which is either
+# models or headless. That way a headless wave never needs Kivy.
+
+# The first bytes of every snapshot (see Wave.snapshot)
+SNAPSHOT_MAGIC = b'PSNP'
+# The version of the snapshot layout
+SNAPSHOT_VERSION = 3
+# The snapshot header: magic, version, random seed, lives, destroyed, frames since
+# firing, number of asteroids spawned from the wave data, number of asteroids, number
+# of bullets, and whether there is a ship
+_SNAPSHOT = struct.Struct('<4sHIiiiIIIB')
+# The ship: x, y, angle, velocity x, velocity y, previous x, previous y
+_SNAPSHIP = struct.Struct('<7d')
+# The size code of each asteroid radius (see wavefile.SIZE_RADII)
+_SIZE_CODES = {wavefile.SIZE_RADII[k]: k for k in range(len(wavefile.SIZE_RADII))}
+# The speed of the fastest asteroid
+_MAX_ASTEROID_SPEED = max(wavefile.SIZE_SPEEDS)
 
 class Wave(object):
     """
@@ -54,7 +78,7 @@ class Wave(object):
     # LIST ANY ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
     # THE ATTRIBUTES LISTED ARE SUGGESTIONS ONLY AND CAN BE CHANGED AS YOU SEE FIT
     # Attribute _data: The data from the wave JSON, for reloading 
-    # Invariant: _data is a dict loaded from a JSON file
+    # Invariant: _data is a wavefile.CompiledWave
     #
     # Attribute _ship: The player ship to control 
     # Invariant: _ship is a Ship object
@@ -63,13 +87,68 @@ class Wave(object):
     # Invariant: _asteroids is a list of Asteroid, possibly empty
     #
     # Attribute _bullets: the bullets currently on screen 
-    # Invariant: _bullets is a list of Bullet, possibly empty
+    # Invariant: _bullets is a list of unexpired Bullet, possibly empty, with at most
+    #            BULLET_MAX elements
     #
     # Attribute _lives: the number of lives left 
     # Invariant: _lives is an int >= 0
     #
     # Attribute _firerate: the number of frames until the player can fire again 
     # Invariant: _firerate is an int >= 0
+    #
+    # Attribute _asteroidarrays: the NumPy copy of the asteroid positions and velocities
+    # Invariant: _asteroidarrays is a physics.BodyArrays with a row for each element of
+    #            _asteroid (in order), or None if the NumPy backend is off
+    #
+    # Attribute _bulletarrays: the NumPy copy of the bullet positions and velocities
+    # Invariant: _bulletarrays is a physics.BodyArrays with a row for each element of
+    #            _bullets (in order), or None if the NumPy backend is off
+    #
+    # Attribute _fired: the bullet fired this tick (which has not moved yet)
+    # Invariant: _fired is a Bullet in _bullets, or None if no bullet was fired
+    #
+    # Attribute _destroyed: the number of asteroids destroyed so far (split or not)
+    # Invariant: _destroyed is an int >= 0
+    #
+    # Attribute _placed: the bodies moved between ticks for drawing, and where they
+    #                   really are
+    # Invariant: _placed is a list of (body, x, y) triples, or None if every body is
+    #            where it really is
+    #
+    # Attribute _bulletpool: the bullets that are gone, ready to be reused
+    # Invariant: _bulletpool is a list of Bullet not in _bullets, possibly empty
+    #
+    # Attribute _asteroidpool: the asteroids that were destroyed (or made ahead of time
+    #                          by prepare), ready to be reused
+    # Invariant: _asteroidpool is a dict from each of SMALL_RADIUS, MEDIUM_RADIUS and
+    #            LARGE_RADIUS to a list of Asteroid of that radius not in _asteroid
+    #
+    # Attribute _spawned: the number of asteroids in _data that have appeared so far
+    # Invariant: _spawned is an int in 0.._data.getcount()
+    #
+    # Attribute _prepared: the number of asteroids in _data made ahead of time so far
+    # Invariant: _prepared is an int in _spawned.._data.getcount()
+    #
+    # Attribute _profiler: the profiler timing each phase of update
+    # Invariant: _profiler is a profiler.Profiler, or None if profiling is off
+    #
+    # Attribute _models: the module with the classes Ship, Asteroid and Bullet
+    # Invariant: _models is the module models, or the module headless if the wave
+    #            is headless
+    #
+    # Attribute _batch: what draws the asteroids and bullets (which hold no graphics)
+    # Invariant: _batch is a BodyBatch from _models, or a BodySprites from _models if
+    #            BATCH_DRAW is False. It is None until complete is called.
+    #
+    # Attribute _events: what happened since the application last asked (see popevents)
+    # Invariant: _events is a list of event names from EVENT_NAMES, or None if events
+    #            are off
+    #
+    # Attribute _seed: the seed of the random numbers of this wave, for replays
+    # Invariant: _seed is an int >= 0 and < 2**32
+    #
+    # Attribute _random: the random numbers of this wave (never use the module random)
+    # Invariant: _random is a random.Random seeded with _seed
     
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
     def getship(self):
@@ -84,17 +163,147 @@ class Wave(object):
     def getlives(self):
         return self._lives
 
+    def getdestroyed(self):
+        return self._destroyed
+
+    def isclear(self):
+        """
+        Returns True if every asteroid of the wave has appeared and been destroyed.
+        """
+        return len(self._asteroid) == 0 and self._spawned == self._data.getcount()
+
+    def getseed(self):
+        return self._seed
+
+    def setlives(self, value):
+        assert isinstance(value, int) and value >= 0
+        self._lives = value
+
+    def setdestroyed(self, value):
+        assert isinstance(value, int) and value >= 0
+        self._destroyed = value
+
+    def setprofiler(self, value):
+        assert value is None or isinstance(value, profiler.Profiler)
+        self._profiler = value
+
+    def setevents(self, value):
+        assert isinstance(value, bool)
+        self._events = [] if value else None
+
     # INITIALIZER (standard form) TO CREATE SHIP AND ASTEROIDS
-    def __init__(self, json):
-        self._data = json
-        self.create_ship(json)
-        self._create_asteroid(json)
+    def __init__(self, json, vectorized=NUMPY_PHYSICS, headless=False, seed=None,
+                 deferred=False):
+        """
+        Initializes the wave from its JSON data.
+
+        If vectorized is True and numpy is installed, the asteroids and bullets are
+        moved with the NumPy backend in physics.py. Otherwise each object moves itself.
+
+        If headless is True, the ship, asteroids and bullets are the pure-data classes
+        from headless.py instead of the GObjects from models.py. A headless wave plays
+        exactly the same way, but does not need game2d and draws nothing.
+
+        All randomness in the wave comes from its own generator, seeded with seed. Two
+        waves with the same data, seed and input play exactly the same.
+
+        If deferred is True, the wave makes nothing that Kivy draws (the textures, the
+        ship and the batch), only its data and asteroids. Such a wave can be made on any
+        thread, but complete must be called on the main thread before it is played.
+
+        Parameter json: The wave data
+        Precondition: json is a wavefile.CompiledWave, or a dict loaded from a wave
+        JSON file (which is compiled first)
+
+        Parameter vectorized: Whether to use the NumPy backend
+        Precondition: vectorized is a bool
+
+        Parameter headless: Whether to simulate the wave without game2d
+        Precondition: headless is a bool
+
+        Parameter seed: The random seed (a random one if None)
+        Precondition: seed is None or an int >= 0 and < 2**32
+
+        Parameter deferred: Whether to leave the ship and batch for complete
+        Precondition: deferred is a bool
+        """
+        assert isinstance(vectorized, bool)
+        assert isinstance(headless, bool)
+        assert isinstance(deferred, bool)
+        assert seed is None or (isinstance(seed, int) and 0 <= seed < 2**32)
+        if seed is None:
+            seed = random.randrange(2**32)
+        self._seed = seed
+        self._random = random.Random(seed)
+        if headless:
+            import headless as models
+        else:
+            import models
+        self._models = models
+        self._batch = None
+        self._ship = None
+        if vectorized and physics.available():
+            self._asteroidarrays = physics.BodyArrays()
+            self._bulletarrays = physics.BodyArrays()
+        else:
+            self._asteroidarrays = None
+            self._bulletarrays = None
+        self._bulletpool = []
+        self._asteroidpool = {SMALL_RADIUS: [], MEDIUM_RADIUS: [], LARGE_RADIUS: []}
+        self._data = wavefile.compile(json)
+        self._asteroid = []
+        self._spawned = 0
+        self._prepared = 0
+        self._create_asteroid()
         self._lives = SHIP_LIVES
+        self._destroyed = 0
         self._bullets = []
         self._lastfire = 0
+        self._fired = None
+        self._placed = None
+        self._profiler = None
+        self._events = None
+        if not deferred:
+            self.complete()
+
+    def complete(self):
+        """
+        Makes the textures, the ship and the batch of a wave made with deferred=True.
+
+        These are Kivy objects, so this must be called on the main thread. Calling it
+        again does nothing.
+        """
+        if self._batch is not None:
+            return
+        self._models.preload_textures()
+        if BATCH_DRAW:
+            self._batch = self._models.BodyBatch()
+        else:
+            self._batch = self._models.BodySprites()
+        self.create_ship(self._data)
 
     # UPDATE METHOD TO MOVE THE SHIP, ASTEROIDS, AND BULLETS
     def update(self,input, dt):
+        """
+        Advances the wave by one physics tick.
+
+        All speeds are per tick, so the wave should be updated TICK_RATE times a second
+        whatever the frame rate (Planetoids takes care of that).
+
+        Parameter input: The player input
+        Precondition: input is a GInput (or any object with the method is_key_down)
+
+        Parameter dt: The length of the tick in seconds
+        Precondition: dt is TICK_TIME
+        """
+        prof = self._profiler
+        if prof is not None:
+            prof.start()
+        self._restore_bodies()
+        if self._spawned < self._data.getcount():
+            self._create_asteroid()
+            if prof is not None:
+                prof.lap('spawn')
         if self._ship is not None: 
             if input.is_key_down('left'):
                 self._ship._turn_left()
@@ -102,100 +311,419 @@ class Wave(object):
                 self._ship._turn_right()
             if input.is_key_down('up'):
                 self._ship._impulse() 
+            if prof is not None:
+                prof.lap('input')
 
             self._ship._moving()
             self._horizontal_deadzsone()
             self._vertical_deadzsone()
+            if prof is not None:
+                prof.lap('ship')
             self.create_bullet(input)
+            if prof is not None:
+                prof.lap('fire')
             self.create_collision()
-
-        for i in range(len(self._asteroid)):   
-            self._asteroid[i].astr_moving()   
-
-            self._astro_horizontal_deadzsone(self._asteroid[i])
-            self._astro_vertical_deadzsone(self._asteroid[i])
-
-        for i in self._bullets:
-            i._moving()
+            if prof is not None:
+                prof.lap('collision')
+
+        if self._asteroidarrays is None:
+            self._move_asteroids()
+            if prof is not None:
+                prof.lap('asteroids')
+            self._move_bullets()
+        else:
+            self._move_asteroid_arrays()
+            if prof is not None:
+                prof.lap('asteroids')
+            self._move_bullet_arrays()
+        if prof is not None:
+            prof.lap('bullets')
+            prof.count('num_asteroids', len(self._asteroid))
+            prof.count('num_bullets', len(self._bullets))
         
-        self._delete_asteroids()
-        self._delete_bullets()
         if self._ship is None:
             self._lives -= 1
         
     # DRAW METHOD TO DRAW THE SHIP, ASTEROIDS, AND BULLETS
-    def draw(self,view):
+    def draw(self,view, alpha=1.0):
+        """
+        Draws the wave alpha of the way from the previous tick to the current one.
+
+        Drawing between ticks keeps the motion smooth when the display rate is not the
+        tick rate. Bodies that wrapped in the last tick are drawn where they are.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView
+
+        Parameter alpha: How far to draw the bodies between the last two ticks
+        Precondition: alpha is a float in 0..1
+        """
+        self._restore_bodies()
+        self._sync_bodies(alpha)
+        if alpha < 1.0:
+            self._place_bodies(alpha)
         if self._ship is not None:
             self._ship.draw(view)
-        
-        for i in range(len(self._asteroid)):   
-            self._asteroid[i].draw(view)  
+        self._batch.draw(view, self._asteroid, self._bullets)
 
-        for i in range(len(self._bullets)): 
-            self._bullets[i].draw(view)  
-              
     # RESET METHOD FOR CREATING A NEW LIFE
 
     # HELPER METHODS FOR PHYSICS AND COLLISION DETECTION
     def create_ship(self, json):
-        ship_data = json['ship']
-        x = ship_data['position'][0]
-        y = ship_data['position'][1]
-        a = ship_data['angle']
-        self._ship = Ship(x, y, a)
+        x, y, a = wavefile.compile(json).getship()
+        self._ship = self._models.Ship(x, y, a)
 
     def create_bullet(self, input):
         self._lastfire += 1
-        if input.is_key_down('spacebar') and self._lastfire >= BULLET_RATE:
-            vector = self._ship.getfacing() * SHIP_RADIUS
+        self._fired = None
+        if (input.is_key_down('spacebar') and self._lastfire >= BULLET_RATE
+            and len(self._bullets) < BULLET_MAX):
+            vector = self._ship.getmuzzle()
             x = vector.x + self._ship.x 
             y = vector.y + self._ship.y
-            v = self._ship.getfacing() * BULLET_SPEED
-            b = Bullet(x,y,v)
+            b = self._make_bullet(x, y, self._ship.getshot())
             self._bullets.append(b)
+            if self._bulletarrays is not None:
+                self._bulletarrays.append(b)
             self._lastfire = 0
+            self._fired = b
+            self._event('fire')
 
     def create_collision(self): 
-        for i in range(len(self._asteroid)):
-            if self._ship is not None:
-                w = SHIP_RADIUS + self._asteroid[i].width/2
-                x = self._ship.x - self._asteroid[i].x
-                y = self._ship.y - self._asteroid[i].y
-                d = (x**2 + y**2)**0.5
-                if w > d:
-                    if self._ship.getvelocity() == introcs.Vector2(0,0):
-                        v = self._ship.getfacing()
+        # Collisions are swept (see bodies.swept_hit): a body hits another if it came
+        # close enough at any time since the last tick, not just where it is now. Each
+        # body moved by its velocity since then (ignoring wrapping), except that the
+        # ship has just moved by its own and a bullet fired this tick has not moved.
+        self._sync_bodies()
+        if self._ship is not None:
+            ship = self._ship
+            vs = ship.getvelocity()
+            # No asteroid moved further relative to the ship than this in the tick
+            motion = vs.length() + _MAX_ASTEROID_SPEED
+            for asteroid in self._asteroid:
+                w = SHIP_RADIUS + asteroid.width/2
+                x = ship.x - asteroid.x
+                y = ship.y - asteroid.y
+                if x*x + y*y >= (w + motion)*(w + motion):
+                    continue
+                if bodies.swept_hit(x, y, vs.x - asteroid.getvx(),
+                                    vs.y - asteroid.getvy(), w):
+                    if vs == introcs.Vector2(0,0):
+                        v = ship.getfacing()
                     else: 
-                        v = self._ship.getvelocity().normalize()
-                    list = self._asteroid[i].resultant_vector(v)
-                    v1 = list[0]
-                    v2 = list[1]
-                    if self._asteroid[i].width/2 == MEDIUM_RADIUS:
-                        self.create_medium_asteroid(v, v1, v2, self._asteroid[i].x, self._asteroid[i].y)
-                    elif self._asteroid[i].width/2 == LARGE_RADIUS:
-                        self.create_large_asteroid(v, v1, v2, self._asteroid[i].x, self._asteroid[i].y)
+                        v = vs.normalize()
+                    self._split_asteroids([(asteroid, v)])
                     self._ship = None
-                    self._asteroid[i].setDestroyed(True)
+                    self._event('crash')
+                    break
 
+        if len(self._bullets) == 0:
+            return
+
+        # Split the asteroids hit all at once at the end (their pieces are appended
+        # to _asteroid, so they could not be hit this frame anyway)
+        hits = []
+        grid = self._bullet_grid()
         for i in range(len(self._asteroid)):
             if not self._asteroid[i].getnowdestroyed():
-                for j in range(len(self._bullets)):
+                for j in self._bullet_candidates(grid, self._asteroid[i]):
                     if not self._bullets[j].getnowdestroyed():
                         w = BULLET_RADIUS + self._asteroid[i].width/2
                         x = self._bullets[j].x - self._asteroid[i].x
                         y = self._bullets[j].y - self._asteroid[i].y
-                        d = (x**2 + y**2)**0.5
-                        if w > d:
-                            v = self._bullets[j].getvelocity().normalize()
-                            list = self._asteroid[i].resultant_vector(v)
-                            v1 = list[0]
-                            v2 = list[1]
-                            if self._asteroid[i].width/2 == MEDIUM_RADIUS:
-                                self.create_medium_asteroid(v, v1, v2, self._asteroid[i].x, self._asteroid[i].y)
-                            elif self._asteroid[i].width/2 == LARGE_RADIUS:
-                                self.create_large_asteroid(v, v1, v2, self._asteroid[i].x, self._asteroid[i].y)
+                        dx = -self._asteroid[i].getvx()
+                        dy = -self._asteroid[i].getvy()
+                        if self._bullets[j] is not self._fired:
+                            dx += self._bullets[j].getvx()
+                            dy += self._bullets[j].getvy()
+                        if bodies.swept_hit(x, y, dx, dy, w):
+                            v = self._bullets[j].getvelocity().normal()
+                            hits.append((self._asteroid[i], v))
                             self._bullets[j].setDestroyed(True)
-                            self._asteroid[i].setDestroyed(True)      
+        if len(hits) > 0:
+            self._split_asteroids(hits)
+
+    def _split_asteroids(self, hits):
+        """
+        Breaks up each asteroid hit in its direction and marks it as destroyed.
+
+        Large and medium asteroids leave three smaller pieces behind, one along the hit
+        and two rotated 120 degrees either side of it. Small asteroids leave nothing.
+        The pieces are added in the order of hits. An asteroid hit twice splits twice.
+
+        Parameter hits: The asteroids hit, each with the direction of the hit
+        Precondition: hits is a list of (asteroid, v) pairs, where asteroid is an
+        Asteroid in _asteroid and v is a normalized introcs.Vector2
+        """
+        directions = bodies.split_directions([hit[1] for hit in hits])
+        for k in range(len(hits)):
+            asteroid, v = hits[k]
+            v1, v2 = directions[k]
+            if asteroid.width/2 == MEDIUM_RADIUS:
+                self.create_medium_asteroid(v, v1, v2, asteroid.x, asteroid.y)
+            elif asteroid.width/2 == LARGE_RADIUS:
+                self.create_large_asteroid(v, v1, v2, asteroid.x, asteroid.y)
+            asteroid.setDestroyed(True)
+            self._event('split')
+        self._destroyed += len(hits)
+
+    def prepare(self, budget=STREAM_BUDGET):
+        """
+        Makes asteroids that have yet to appear ahead of time, for at most budget seconds.
+
+        The asteroids made go in the pools, so that when they appear (see
+        _create_asteroid) it only costs a reset. Planetoids calls this once a frame, so
+        streaming a huge wave spreads the cost of making its asteroids over many frames.
+        Asteroids not made ahead of time are made when they appear.
+
+        Parameter budget: The most time to spend, in seconds
+        Precondition: budget is a number >= 0
+        """
+        xs, ys, dxs, dys, sizes = self._data.getasteroids()
+        if self._prepared == len(sizes):
+            return
+        end = time.perf_counter() + budget
+        i = self._prepared
+        while i < len(sizes) and time.perf_counter() < end:
+            size = sizes[i]
+            radius = wavefile.SIZE_RADII[size]
+            vector = introcs.Vector2(dxs[i], dys[i]) * wavefile.SIZE_SPEEDS[size]
+            self._asteroidpool[radius].append(
+                self._models.Asteroid(xs[i], ys[i], radius*2, radius*2,
+                                      wavefile.SIZE_IMAGES[size], vector))
+            i += 1
+        self._prepared = i
+
+    def popevents(self):
+        """
+        Returns the events since the last call, oldest first, and forgets them.
+
+        An event is the name of something that happened in an update: 'fire' when the
+        ship fires a bullet, 'split' when an asteroid is destroyed, and 'crash' when the
+        ship is destroyed. Events are off until turned on with setevents(True); until
+        then this returns the empty list.
+        """
+        if self._events is None:
+            return []
+        events = self._events
+        self._events = []
+        return events
+
+    # SNAPSHOTS OF THE WHOLE WAVE
+    def snapshot(self):
+        """
+        Returns the state of the wave as a compact bytes object.
+
+        The snapshot holds everything that update changes: the ship, every asteroid and
+        bullet (position, previous position, velocity, and age or size), the lives, the
+        score, the fire timer, how many asteroids have appeared, and the random seed.
+        restore puts it all back, and the wave then plays exactly as it would have from
+        that point.
+
+        Nothing in a wave draws from its random numbers yet, so their state is always
+        the one the seed gives, and the seed is all the snapshot keeps of it. Anything
+        that starts drawing from _random must add the state (and a new version).
+
+        The layout is a header (_SNAPSHOT), the ship (_SNAPSHIP) if there is one, then
+        the asteroids and bullets as columns (see BodyArrays.tobytes) with a size code
+        per asteroid after its columns. The columns are in the byte order of the
+        machine. There is no per-body overhead, so a snapshot is about 53 bytes per body
+        plus 35 bytes (91 with the ship).
+        """
+        self._restore_bodies()
+        ship = self._ship
+        parts = [_SNAPSHOT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self._seed, self._lives,
+                                self._destroyed, self._lastfire, self._spawned,
+                                len(self._asteroid), len(self._bullets), ship is not None)]
+        if ship is not None:
+            v = ship.getvelocity()
+            px, py = ship.getprevious()
+            parts.append(_SNAPSHIP.pack(ship.x, ship.y, ship.angle, v.x, v.y, px, py))
+        parts.append(self._pack_bodies(self._asteroid, self._asteroidarrays, False))
+        parts.append(bytes([_SIZE_CODES[a.width/2] for a in self._asteroid]))
+        parts.append(self._pack_bodies(self._bullets, self._bulletarrays, True))
+        return b''.join(parts)
+
+    def restore(self, data):
+        """
+        Puts the wave back in the state of the snapshot data.
+
+        The snapshot should come from a wave with the same data. The bodies of the wave
+        now are put back in the pools and reused for the bodies in the snapshot.
+
+        Parameter data: The snapshot
+        Precondition: data is a bytes-like object returned by snapshot. If it is not
+        a snapshot, this raises a ValueError.
+        """
+        data = memoryview(data)
+        if len(data) < _SNAPSHOT.size:
+            raise ValueError('not a wave snapshot')
+        (magic, version, seed, lives, destroyed, lastfire,
+         spawned, n, m, hasship) = _SNAPSHOT.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError('not a version %d wave snapshot' % SNAPSHOT_VERSION)
+        offset = _SNAPSHOT.size
+        self._restore_bodies()
+        self._seed = seed
+        self._random.seed(seed)
+        self._lives = lives
+        self._destroyed = destroyed
+        self._lastfire = lastfire
+        self._fired = None
+        self._spawned = spawned
+        self._prepared = max(self._prepared, spawned)
+
+        self._ship = None
+        if hasship:
+            x, y, a, vx, vy, px, py = _SNAPSHIP.unpack_from(data, offset)
+            offset += _SNAPSHIP.size
+            self._ship = self._models.Ship(x, y, a)
+            self._ship.setvelocity(introcs.Vector2(vx, vy))
+            self._ship.setprevious(px, py)
+
+        for asteroid in self._asteroid:
+            self._asteroidpool[asteroid.width/2].append(asteroid)
+        self._asteroid = []
+        columns = data[offset:offset+52*n]
+        sizes = data[offset+52*n:offset+53*n]
+        for x, y, px, py, vx, vy, age, code in self._unpack_bodies(columns, n, sizes):
+            asteroid = self._make_asteroid(x, y, wavefile.SIZE_RADII[code],
+                                           wavefile.SIZE_IMAGES[code],
+                                           introcs.Vector2(vx, vy))
+            asteroid.setprevious(px, py)
+            self._asteroid.append(asteroid)
+        if self._asteroidarrays is not None:
+            self._asteroidarrays.frombytes(columns, n)
+        offset += 53*n
+
+        self._bulletpool.extend(self._bullets)
+        self._bullets = []
+        columns = data[offset:offset+52*m]
+        for x, y, px, py, vx, vy, age, code in self._unpack_bodies(columns, m, bytes(m)):
+            bullet = self._make_bullet(x, y, introcs.Vector2(vx, vy))
+            bullet.setprevious(px, py)
+            bullet.setage(age)
+            self._bullets.append(bullet)
+        if self._bulletarrays is not None:
+            self._bulletarrays.frombytes(columns, m)
+
+    def _pack_bodies(self, bodies, arrays, aged):
+        """
+        Returns the columns of bodies as bytes, in the layout of BodyArrays.tobytes.
+
+        Parameter bodies: The bodies
+        Precondition: bodies is _asteroid or _bullets
+
+        Parameter arrays: The NumPy copy of bodies
+        Precondition: arrays is the physics.BodyArrays of bodies, or None
+
+        Parameter aged: Whether the bodies have an age (bullets do, asteroids do not)
+        Precondition: aged is a bool
+        """
+        if arrays is not None:
+            return arrays.tobytes()
+        previous = [body.getprevious() for body in bodies]
+        columns = array('d', [body.x for body in bodies])
+        columns.extend([body.y for body in bodies])
+        columns.extend([p[0] for p in previous])
+        columns.extend([p[1] for p in previous])
+        columns.extend([body.getvx() for body in bodies])
+        columns.extend([body.getvy() for body in bodies])
+        if aged:
+            ages = array('i', [body.getage() for body in bodies])
+        else:
+            ages = array('i', bytes(4*len(bodies)))
+        return columns.tobytes() + ages.tobytes()
+
+    def _unpack_bodies(self, columns, size, codes):
+        """
+        Returns the rows in columns as (x, y, px, py, vx, vy, age, code) tuples.
+
+        Parameter columns: The columns of the bodies
+        Precondition: columns is bytes-like, in the layout of BodyArrays.tobytes
+
+        Parameter size: The number of bodies
+        Precondition: size is an int >= 0
+
+        Parameter codes: The size code of each body
+        Precondition: codes is bytes-like of length size
+        """
+        values = array('d')
+        values.frombytes(columns[:48*size])
+        ages = array('i')
+        ages.frombytes(columns[48*size:52*size])
+        n = size
+        return zip(values[0:n], values[n:2*n], values[2*n:3*n], values[3*n:4*n],
+                   values[4*n:5*n], values[5*n:6*n], ages, codes)
+
+    def _event(self, name):
+        """
+        Records that the event name happened, if events are on.
+
+        Parameter name: The event
+        Precondition: name is in EVENT_NAMES
+        """
+        if self._events is not None:
+            self._events.append(name)
+
+    def _bullet_grid(self):
+        """
+        Returns a spatial hash of the live bullets for the collision broad phase.
+
+        The hash maps a cell (column, row) of a uniform grid with cells COLLISION_CELL
+        wide to the list of indices into _bullets of the bullets whose centers are in
+        that cell. The grid starts at the edge of the dead zone, so everything that can
+        wrap lands in a non-negative cell. Each list is in increasing index order.
+        """
+        grid = {}
+        for j in range(len(self._bullets)):
+            bullet = self._bullets[j]
+            if not bullet.getnowdestroyed():
+                cell = (int((bullet.x + COLLISION_ORIGIN) // COLLISION_CELL),
+                        int((bullet.y + COLLISION_ORIGIN) // COLLISION_CELL))
+                if cell in grid:
+                    grid[cell].append(j)
+                else:
+                    grid[cell] = [j]
+        return grid
+
+    def _bullet_candidates(self, grid, asteroid):
+        """
+        Returns the indices of the bullets that might hit asteroid, in increasing order.
+
+        Only the cells overlapping the box of half-width (asteroid radius + BULLET_RADIUS
+        + COLLISION_SWEEP) around the asteroid are visited. Every bullet that came close
+        enough to hit the asteroid since the last tick has its center inside that box,
+        so no hit is missed.
+
+        Parameter grid: The spatial hash of the bullets
+        Precondition: grid is the value of _bullet_grid() for this frame
+
+        Parameter asteroid: The asteroid to test
+        Precondition: asteroid is an Asteroid
+        """
+        reach = asteroid.width/2 + BULLET_RADIUS + COLLISION_SWEEP
+        left = int((asteroid.x - reach + COLLISION_ORIGIN) // COLLISION_CELL)
+        right = int((asteroid.x + reach + COLLISION_ORIGIN) // COLLISION_CELL)
+        bottom = int((asteroid.y - reach + COLLISION_ORIGIN) // COLLISION_CELL)
+        top = int((asteroid.y + reach + COLLISION_ORIGIN) // COLLISION_CELL)
+
+        result = None
+        merged = False
+        for col in range(left, right+1):
+            for row in range(bottom, top+1):
+                cell = grid.get((col, row))
+                if cell is not None:
+                    if result is None:
+                        result = cell
+                    else:
+                        result = result + cell
+                        merged = True
+        if result is None:
+            return []
+        if merged:
+            result.sort()
+        return result
 
     def create_medium_asteroid(self, v, v1, v2, x, y):
         x1 = SMALL_RADIUS * v.x + x
@@ -206,14 +734,14 @@ class Wave(object):
         y2 = SMALL_RADIUS * v1.y + y
         y3 = SMALL_RADIUS * v2.y + y
 
-        ast = Asteroid(x1, y1, SMALL_RADIUS*2, SMALL_RADIUS*2, SMALL_IMAGE, v * SMALL_SPEED)
-        self._asteroid.append(ast)
+        ast = self._make_asteroid(x1, y1, SMALL_RADIUS, SMALL_IMAGE, v * SMALL_SPEED)
+        self._add_asteroid(ast)
 
-        ast1 = Asteroid(x2, y2, SMALL_RADIUS*2, SMALL_RADIUS*2, SMALL_IMAGE, v1 * SMALL_SPEED)
-        self._asteroid.append(ast1)
+        ast1 = self._make_asteroid(x2, y2, SMALL_RADIUS, SMALL_IMAGE, v1 * SMALL_SPEED)
+        self._add_asteroid(ast1)
 
-        ast2 = Asteroid(x3, y3, SMALL_RADIUS*2, SMALL_RADIUS*2, SMALL_IMAGE, v2 * SMALL_SPEED)
-        self._asteroid.append(ast2)
+        ast2 = self._make_asteroid(x3, y3, SMALL_RADIUS, SMALL_IMAGE, v2 * SMALL_SPEED)
+        self._add_asteroid(ast2)
 
     def create_large_asteroid(self, v, v1, v2, x, y):
         x1 = MEDIUM_RADIUS * v.x + x
@@ -224,14 +752,14 @@ class Wave(object):
         y2 = MEDIUM_RADIUS * v1.y + y
         y3 = MEDIUM_RADIUS * v2.y + y
 
-        ast = Asteroid(x1, y1, MEDIUM_RADIUS*2, MEDIUM_RADIUS*2, MEDIUM_IMAGE, v * MEDIUM_SPEED)
-        self._asteroid.append(ast)
+        ast = self._make_asteroid(x1, y1, MEDIUM_RADIUS, MEDIUM_IMAGE, v * MEDIUM_SPEED)
+        self._add_asteroid(ast)
 
-        ast1 = Asteroid(x2, y2, MEDIUM_RADIUS*2, MEDIUM_RADIUS*2, MEDIUM_IMAGE, v1 * MEDIUM_SPEED)
-        self._asteroid.append(ast1)
+        ast1 = self._make_asteroid(x2, y2, MEDIUM_RADIUS, MEDIUM_IMAGE, v1 * MEDIUM_SPEED)
+        self._add_asteroid(ast1)
 
-        ast2 = Asteroid(x3, y3, MEDIUM_RADIUS*2, MEDIUM_RADIUS*2, MEDIUM_IMAGE, v2 * MEDIUM_SPEED)
-        self._asteroid.append(ast2)
+        ast2 = self._make_asteroid(x3, y3, MEDIUM_RADIUS, MEDIUM_IMAGE, v2 * MEDIUM_SPEED)
+        self._add_asteroid(ast2)
 
     def _horizontal_deadzsone(self):
         if self._ship.x < - DEAD_ZONE:
@@ -245,23 +773,26 @@ class Wave(object):
         if self._ship.y > GAME_HEIGHT + DEAD_ZONE:
             self._ship.y -=  GAME_HEIGHT + (2*DEAD_ZONE)
 
-    def _create_asteroid(self, json):
-        self._asteroid = []
-        for i in range(len(json["asteroids"])):
-            asteroid_data = json['asteroids'][i] 
-            size = asteroid_data['size']
-            x=asteroid_data['position'][0]
-            y = asteroid_data['position'][1]
-            d = asteroid_data['direction']
-            vector = introcs.Vector2(d[0], d[1])
-            vector.normalize()
-            if size == LARGE_ASTEROID: 
-                ast = Asteroid(x, y, LARGE_RADIUS*2, LARGE_RADIUS * 2, LARGE_IMAGE, vector * LARGE_SPEED)
-            if size == MEDIUM_ASTEROID:
-                ast = Asteroid(x, y, MEDIUM_RADIUS*2, MEDIUM_RADIUS*2, MEDIUM_IMAGE, vector * MEDIUM_SPEED)
-            if size == SMALL_ASTEROID:
-                ast = Asteroid(x, y, SMALL_RADIUS*2, SMALL_RADIUS*2, SMALL_IMAGE, vector * SMALL_SPEED)
-            self._asteroid.append(ast)
+    def _create_asteroid(self):
+        """
+        Adds the next STREAM_RATE asteroids of the wave data (or all that are left).
+
+        A wave with more asteroids than that does not make them all at once, which
+        would hold up its first frame. The rest appear at the start of the ticks after,
+        STREAM_RATE at a time. Since the rate is a count, not a time, this plays the
+        same on every machine (and in replays).
+        """
+        xs, ys, dxs, dys, sizes = self._data.getasteroids()
+        end = min(self._spawned + STREAM_RATE, len(sizes))
+        for i in range(self._spawned, end):
+            size = sizes[i]
+            vector = introcs.Vector2(dxs[i], dys[i])
+            ast = self._make_asteroid(xs[i], ys[i], wavefile.SIZE_RADII[size],
+                                      wavefile.SIZE_IMAGES[size],
+                                      vector * wavefile.SIZE_SPEEDS[size])
+            self._add_asteroid(ast)
+        self._spawned = end
+        self._prepared = max(self._prepared, end)
 
     def _astro_horizontal_deadzsone(self, asteroid):
         if asteroid.x < - DEAD_ZONE:
@@ -275,55 +806,220 @@ class Wave(object):
         if asteroid.y > GAME_HEIGHT + DEAD_ZONE:
             asteroid.y -=  GAME_HEIGHT + (2*DEAD_ZONE)  
                 
-    def _delete_bullets(self):
-        b = 0
-        while b < len(self._bullets):
-            if self._bullets[b].getnowdestroyed():
-                del self._bullets[b]
+    def _move_asteroids(self):
+        """
+        Moves the asteroids and removes the destroyed ones in a single pass.
+
+        The list is compacted in place: each asteroid that survives is moved down over
+        the ones removed before it, and the leftover tail is cut off once at the end.
+        So removing any number of asteroids costs the same as moving them.
+        """
+        asteroids = self._asteroid
+        kept = 0
+        for asteroid in asteroids:
+            if asteroid.getnowdestroyed():
+                self._asteroidpool[asteroid.width/2].append(asteroid)
             else:
-                b += 1
-
-    def _delete_asteroids(self):
-        b = 0
-        while b < len(self._asteroid):
-            if self._asteroid[b].getnowdestroyed():
-                del self._asteroid[b]
+                asteroid.astr_moving()
+                self._astro_horizontal_deadzsone(asteroid)
+                self._astro_vertical_deadzsone(asteroid)
+                asteroids[kept] = asteroid
+                kept += 1
+        del asteroids[kept:]
+
+    def _move_bullets(self):
+        """
+        Moves the bullets and removes the dead ones in a single pass.
+
+        Bullets destroyed by a collision this frame are dropped, as are bullets that
+        expire (see Bullet.isexpired) once they have moved. The list is compacted in
+        place, like in _move_asteroids.
+        """
+        bullets = self._bullets
+        kept = 0
+        for bullet in bullets:
+            if bullet.getnowdestroyed():
+                self._bulletpool.append(bullet)
             else:
-                b += 1
-
-    
-
-    
-
-
-        
-
-
-
-
-
-
-    
-
-    
-
-                
-
-
-            
-
-
-
-
-
-
-
-
-
-
-
-        
-
+                bullet._moving()
+                if bullet.isexpired():
+                    self._bulletpool.append(bullet)
+                else:
+                    bullets[kept] = bullet
+                    kept += 1
+        del bullets[kept:]
+
+    def _move_asteroid_arrays(self):
+        """
+        Moves the asteroids with the NumPy backend and removes the destroyed ones.
+
+        This does the same thing as _move_asteroids, but the moving happens on the
+        arrays, after the destroyed rows are compacted away.
+        """
+        keep = [not asteroid.getnowdestroyed() for asteroid in self._asteroid]
+        if not all(keep):
+            self._asteroidarrays.compact(keep)
+            self._compact(self._asteroid, keep)
+        self._asteroidarrays.step()
+        self._asteroidarrays.wrap()
+
+    def _move_bullet_arrays(self):
+        """
+        Moves the bullets with the NumPy backend and removes the dead ones.
+
+        This does the same thing as _move_bullets, but the moving and the expiry test
+        happen on the arrays.
+        """
+        arrays = self._bulletarrays
+        keep = [not bullet.getnowdestroyed() for bullet in self._bullets]
+        arrays.step()
+        keep = physics.numpy.logical_and(keep, ~arrays.expired())
+        if not keep.all():
+            arrays.compact(keep)
+            self._compact(self._bullets, keep.tolist())
+
+    def _compact(self, bodies, keep):
+        """
+        Removes the bodies that keep marks as False in place, returning them to a pool.
+
+        Parameter bodies: The bodies to compact
+        Precondition: bodies is _asteroid or _bullets
+
+        Parameter keep: Whether to keep each body
+        Precondition: keep is a list of len(bodies) bools
+        """
+        kept = 0
+        for body, live in zip(bodies, keep):
+            if live:
+                bodies[kept] = body
+                kept += 1
+            elif bodies is self._bullets:
+                self._bulletpool.append(body)
+            else:
+                self._asteroidpool[body.width/2].append(body)
+        del bodies[kept:]
+
+    def _make_bullet(self, x, y, v):
+        """
+        Returns a bullet at (x, y) with velocity v, reusing one from the pool if it can.
+
+        Parameter x: The horizontal coordinate of the bullet center
+        Precondition: x is a float
+
+        Parameter y: The vertical coordinate of the bullet center
+        Precondition: y is a float
+
+        Parameter v: The bullet velocity
+        Precondition: v is an introcs.Vector2
+        """
+        if len(self._bulletpool) > 0:
+            bullet = self._bulletpool.pop()
+            bullet.reset(x, y, v)
+            return bullet
+        return self._models.Bullet(x, y, v)
+
+    def _make_asteroid(self, x, y, radius, source, v):
+        """
+        Returns an asteroid at (x, y) with velocity v, reusing one from the pool if it can.
+
+        Parameter x: The horizontal coordinate of the asteroid center
+        Precondition: x is an int or float
+
+        Parameter y: The vertical coordinate of the asteroid center
+        Precondition: y is an int or float
+
+        Parameter radius: The asteroid radius
+        Precondition: radius is one of SMALL_RADIUS, MEDIUM_RADIUS or LARGE_RADIUS
+
+        Parameter source: The asteroid image
+        Precondition: source is the image for radius (e.g. SMALL_IMAGE for SMALL_RADIUS)
+
+        Parameter v: The asteroid velocity
+        Precondition: v is an introcs.Vector2
+        """
+        pool = self._asteroidpool[radius]
+        if len(pool) > 0:
+            asteroid = pool.pop()
+            asteroid.reset(x, y, v)
+            return asteroid
+        return self._models.Asteroid(x, y, radius*2, radius*2, source, v)
+
+    def _add_asteroid(self, asteroid):
+        """
+        Adds asteroid to the wave (and to the NumPy backend if it is on).
+
+        Parameter asteroid: The asteroid to add
+        Precondition: asteroid is an Asteroid
+        """
+        self._asteroid.append(asteroid)
+        if self._asteroidarrays is not None:
+            self._asteroidarrays.append(asteroid)
+
+    def _sync_bodies(self, alpha=1.0):
+        """
+        Copies the NumPy positions back to the asteroids and bullets if the backend is on.
+
+        Parameter alpha: How far to place the bodies between the last two ticks
+        Precondition: alpha is a float in 0..1
+        """
+        if self._asteroidarrays is not None:
+            self._asteroidarrays.sync(self._asteroid, alpha)
+            self._bulletarrays.sync(self._bullets, alpha)
+
+    def _place_bodies(self, alpha):
+        """
+        Moves the bodies alpha of the way from their previous positions for drawing.
+
+        The real positions are saved in _placed, and _restore_bodies must put them back
+        before the wave is updated. Bodies handled by the NumPy backend are skipped, as
+        _sync_bodies already placed them. So are bodies that jumped more than half the
+        screen, since they wrapped.
+
+        Parameter alpha: How far to place the bodies between the last two ticks
+        Precondition: alpha is a float in 0..1
+        """
+        bodies = [] if self._ship is None else [self._ship]
+        if self._asteroidarrays is None:
+            bodies = bodies + self._asteroid + self._bullets
+        placed = []
+        for body in bodies:
+            prev = body.getprevious()
+            x = body.x
+            y = body.y
+            dx = x - prev[0]
+            dy = y - prev[1]
+            if abs(dx) < GAME_WIDTH/2 and abs(dy) < GAME_HEIGHT/2:
+                placed.append((body, x, y))
+                body.x = prev[0] + dx*alpha
+                body.y = prev[1] + dy*alpha
+        self._placed = placed
+
+    def _restore_bodies(self):
+        """
+        Puts back any bodies that _place_bodies moved for drawing.
+        """
+        if self._placed is not None:
+            for body, x, y in self._placed:
+                body.x = x
+                body.y = y
+            self._placed = None
+
+
+def preload_assets(headless=False):
+    """
+    Loads the images a wave draws (see models.preload_textures) ahead of time.
 
+    Every Wave does this when it is made, so calling this first (say, while the title
+    screen is up) only moves that work earlier. The application calls it so that it
+    never needs to import models itself.
 
-    
\ No newline at end of file
+    Parameter headless: Whether the waves will be headless (which load nothing)
+    Precondition: headless is a bool
+    """
+    if headless:
+        import headless as models
+    else:
+        import models
+    models.preload_textures()
+    if NUMPY_PHYSICS:
+        physics.available()
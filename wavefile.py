@@ -0,0 +1,284 @@
+"""
+Wave file module for Planetoids
+
+This module turns the JSON data of a wave into a CompiledWave: a validated, compact
+form that Wave can build itself from without looking at strings or dictionaries. The
+asteroids are stored as typed arrays (positions, normalized directions, and a small
+integer code for the size), one entry per asteroid.
+
+Compiling a wave file is done once. The function load keeps the compiled wave of each
+file it has read, and only reads (and validates) the file again if its modification
+time changed. So restarting a wave, or respawning the ship, never touches the disk.
+
+A wave file is a JSON object of the form
+
+    {"ship": {"position": [x, y], "angle": a},
+     "asteroids": [{"size": "large", "position": [x, y], "direction": [dx, dy]}, ...]}
+
+where size is one of LARGE_ASTEROID, MEDIUM_ASTEROID or SMALL_ASTEROID and direction
+is not the zero vector.
+
+Waves do not have to come from files. The function generate makes a compiled wave of
+any number of asteroids from a random seed, which is the same every time for the same
+seed.
+"""
+from consts import *
+from array import array
+import introcs
+import json
+import math
+import os
+import random
+
+# The size names, indexed by size code
+SIZE_NAMES = (SMALL_ASTEROID, MEDIUM_ASTEROID, LARGE_ASTEROID)
+# The planetoid radius for each size code
+SIZE_RADII = (SMALL_RADIUS, MEDIUM_RADIUS, LARGE_RADIUS)
+# The planetoid image for each size code
+SIZE_IMAGES = (SMALL_IMAGE, MEDIUM_IMAGE, LARGE_IMAGE)
+# The planetoid speed for each size code
+SIZE_SPEEDS = (SMALL_SPEED, MEDIUM_SPEED, LARGE_SPEED)
+
+# The waves compiled by load, keyed by path, as (modification time, CompiledWave) pairs
+_CACHE = {}
+
+
+class CompiledWave(object):
+    """
+    A class representing the validated contents of a wave file.
+
+    Compiled waves are never changed once they are made, so one can be shared by any
+    number of waves (and threads).
+    """
+    # Attribute _ship: the starting position and angle of the ship
+    # Invariant: _ship is an (x, y, angle) tuple of ints or floats
+    #
+    # Attribute _x, _y: the starting positions of the asteroids
+    # Invariant: _x and _y are array('d') of the same length
+    #
+    # Attribute _dx, _dy: the normalized directions of the asteroids
+    # Invariant: _dx and _dy are array('d') of the same length as _x
+    #
+    # Attribute _size: the size codes of the asteroids (indices into SIZE_NAMES)
+    # Invariant: _size is an array('b') of the same length as _x
+
+    # GETTERS
+    def getship(self):
+        return self._ship
+
+    def getcount(self):
+        return len(self._size)
+
+    def getasteroids(self):
+        """
+        Returns the asteroid arrays as a tuple (x, y, dx, dy, size).
+        """
+        return (self._x, self._y, self._dx, self._dy, self._size)
+
+    def tojson(self):
+        """
+        Returns the wave as JSON data, in the form of a wave file.
+
+        Compiling the result gives back this wave, except that the directions are
+        normalized again, which may change their last bit.
+        """
+        x, y, a = self._ship
+        asteroids = []
+        for i in range(len(self._size)):
+            asteroids.append({'size': SIZE_NAMES[self._size[i]],
+                              'position': [self._x[i], self._y[i]],
+                              'direction': [self._dx[i], self._dy[i]]})
+        return {'ship': {'position': [x, y], 'angle': a}, 'asteroids': asteroids}
+
+    # INITIALIZER
+    def __init__(self, data):
+        """
+        Initializes the compiled wave from the JSON data of a wave.
+
+        Parameter data: The wave data
+        Precondition: data is a dict loaded from a wave JSON file (it is checked, and
+        a ValueError explains any problem)
+        """
+        self._ship = _parse_ship(data)
+        self._x = array('d')
+        self._y = array('d')
+        self._dx = array('d')
+        self._dy = array('d')
+        self._size = array('b')
+        asteroids = _field(data, 'asteroids', list, 'the wave')
+        for i in range(len(asteroids)):
+            self._add_asteroid(asteroids[i], 'asteroid %d' % i)
+
+    def _add_asteroid(self, data, where):
+        """
+        Checks the JSON data of one asteroid and adds it to the arrays.
+
+        Parameter data: The asteroid data
+        Precondition: data is any value
+
+        Parameter where: A description of the asteroid for error messages
+        Precondition: where is a string
+        """
+        size = _field(data, 'size', str, where)
+        if not size in SIZE_NAMES:
+            raise ValueError('%s has unknown size %s' % (where, repr(size)))
+        x, y = _pair(data, 'position', where)
+        dx, dy = _pair(data, 'direction', where)
+        if dx == 0 and dy == 0:
+            raise ValueError('%s has no direction' % where)
+        vector = introcs.Vector2(dx, dy)
+        vector.normalize()
+        self._append(x, y, vector.x, vector.y, SIZE_NAMES.index(size))
+
+    def _append(self, x, y, dx, dy, code):
+        """
+        Adds an asteroid to the arrays, without checking it.
+
+        Parameter x: The horizontal coordinate of the asteroid center
+        Precondition: x is an int or float
+
+        Parameter y: The vertical coordinate of the asteroid center
+        Precondition: y is an int or float
+
+        Parameter dx: The horizontal component of the normalized direction
+        Precondition: dx is a float
+
+        Parameter dy: The vertical component of the normalized direction
+        Precondition: dy is a float
+
+        Parameter code: The size code
+        Precondition: code is an index into SIZE_NAMES
+        """
+        self._x.append(x)
+        self._y.append(y)
+        self._dx.append(dx)
+        self._dy.append(dy)
+        self._size.append(code)
+
+
+def load(path):
+    """
+    Returns the compiled wave in the JSON file path.
+
+    The file is only read and compiled if it has not been loaded before, or if it has
+    been modified since.
+
+    Parameter path: The wave file
+    Precondition: path is the name of a wave JSON file
+    """
+    assert isinstance(path, str)
+    mtime = os.stat(path).st_mtime_ns
+    if path in _CACHE and _CACHE[path][0] == mtime:
+        return _CACHE[path][1]
+    with open(path) as file:
+        result = CompiledWave(json.load(file))
+    _CACHE[path] = (mtime, result)
+    return result
+
+
+def generate(count, seed, mix=GENERATE_MIX):
+    """
+    Returns a compiled wave of count asteroids made from the random seed.
+
+    The ship starts in the center of the screen, facing up. The asteroids are placed
+    anywhere on the screen except within GENERATE_CLEARANCE of the ship, heading in
+    any direction, with sizes drawn in the proportions of mix. The same arguments
+    always make the same wave.
+
+    Parameter count: The number of asteroids
+    Precondition: count is an int >= 0
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+
+    Parameter mix: The weights of the small, medium and large sizes
+    Precondition: mix is a tuple of three numbers >= 0, not all 0
+    """
+    assert isinstance(count, int) and count >= 0
+    assert len(mix) == len(SIZE_NAMES) and sum(mix) > 0
+    rand = random.Random(seed)
+    sx, sy = GAME_WIDTH/2, GAME_HEIGHT/2
+    result = CompiledWave({'ship': {'position': [sx, sy], 'angle': 90}, 'asteroids': []})
+    codes = rand.choices(range(len(SIZE_NAMES)), weights=mix, k=count)
+    for code in codes:
+        x, y = sx, sy
+        while (x-sx)*(x-sx) + (y-sy)*(y-sy) < GENERATE_CLEARANCE*GENERATE_CLEARANCE:
+            x = rand.uniform(0, GAME_WIDTH)
+            y = rand.uniform(0, GAME_HEIGHT)
+        a = rand.uniform(0, 2*math.pi)
+        result._append(x, y, math.cos(a), math.sin(a), code)
+    return result
+
+
+def compile(data):
+    """
+    Returns data as a compiled wave.
+
+    Parameter data: The wave data
+    Precondition: data is a CompiledWave, or a dict loaded from a wave JSON file
+    """
+    if isinstance(data, CompiledWave):
+        return data
+    return CompiledWave(data)
+
+
+# HELPER FUNCTIONS FOR VALIDATION
+def _parse_ship(data):
+    """
+    Returns the ship of the wave data as an (x, y, angle) tuple.
+
+    Parameter data: The wave data
+    Precondition: data is any value
+    """
+    ship = _field(data, 'ship', dict, 'the wave')
+    x, y = _pair(ship, 'position', 'the ship')
+    angle = _field(ship, 'angle', (int, float), 'the ship')
+    return (x, y, angle)
+
+
+def _field(data, key, kind, where):
+    """
+    Returns data[key] after checking that it exists and has type kind.
+
+    Parameter data: The JSON object to look in
+    Precondition: data is any value
+
+    Parameter key: The field name
+    Precondition: key is a string
+
+    Parameter kind: The type (or tuple of types) the field must have
+    Precondition: kind is a type or a tuple of types
+
+    Parameter where: A description of data for error messages
+    Precondition: where is a string
+    """
+    if not isinstance(data, dict):
+        raise ValueError('%s is not a JSON object' % where)
+    if not key in data:
+        raise ValueError('%s has no %s' % (where, key))
+    value = data[key]
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError('%s has an invalid %s: %s' % (where, key, repr(value)))
+    return value
+
+
+def _pair(data, key, where):
+    """
+    Returns data[key] after checking that it is a list of two numbers.
+
+    Parameter data: The JSON object to look in
+    Precondition: data is any value
+
+    Parameter key: The field name
+    Precondition: key is a string
+
+    Parameter where: A description of data for error messages
+    Precondition: where is a string
+    """
+    value = _field(data, key, list, where)
+    if len(value) != 2:
+        raise ValueError('%s has an invalid %s: %s' % (where, key, repr(value)))
+    for item in value:
+        if not isinstance(item, (int, float)) or isinstance(item, bool):
+            raise ValueError('%s has an invalid %s: %s' % (where, key, repr(value)))
+    return value[0], value[1]